@@ -20,6 +20,7 @@ from .continued_fraction import (
     continued_fraction_val,
 )
 from .decorators import (
+    diskmemoize,
     linuxtime,
     logdecorate,
     memoize,
@@ -29,27 +30,59 @@ from .decorators import (
     timing_wall,
 )
 from .helpers import (  # pylint: disable=E0401,E0402 # noqa: W0401,W0611
+    DirSnapshot,
+    HashCache,
+    ParsedResultCache,
+    SharedResult,
+    afilecache,
     basic_auth,
     closeifrunningloky,
+    combine_pi_hits,
     eprint,
     file_exists_current,
     filecache,
+    get_executor,
     getselectedhreflinks,
+    getselectedhreflinks_batch,
     hashfile,
+    hashfiles,
     int2bin,
+    is_free_threaded,
+    iterselectedhreflinks,
+    learned_costs,
+    load_cores,
     pi_for_cpu_load,
+    pi_for_cpu_load_vectorized,
+    pi_hits,
+    pi_hits_vectorized,
+    pi_task_calls,
+    pooled_session,
+    recommended_how,
     recurse_files_in_folder,
     run_grouped,
+    run_grouped_as_completed,
+    scan_files,
     setuplogger,
+    shutdown_executors,
+    spawn_seeds,
     thread_native_id_filter,
+    update_snapshot,
+    warmup_executor,
 )
 from .mathhelpers import (
+    NeedsDistribution,
     easybisect,
     intp,
+    needs_pmf,
     polyroot,
     probneeds,
+    probneeds_approx,
+    probneeds_estimate,
+    probneeds_levels,
     probneeds_new,
+    probneeds_quantile,
     probneeds_rec,
+    probneeds_scenarios,
 )
 from .moduletools import moduleexport
 
@@ -59,38 +92,71 @@ thevaluefragmentslogger.addHandler(hdlr=logging.NullHandler())
 thevaluefragmentslogger.debug(msg="valuefragments __init__")
 __all__: list[str] = [
     #    "backgroundme",
+    "afilecache",
     "basic_auth",
     "closeifrunningloky",
+    "combine_pi_hits",
     "continued_fraction",
     "continued_fraction_show",
     "continued_fraction_val",
     "ContinuedFraction",
+    "DirSnapshot",
+    "diskmemoize",
     "easybisect",
     "eprint",
     "file_exists_current",
     "filecache",
+    "get_executor",
     "getselectedhreflinks",
+    "getselectedhreflinks_batch",
+    "HashCache",
     "hashfile",
+    "hashfiles",
     "int2bin",
     "intp",
+    "is_free_threaded",
+    "iterselectedhreflinks",
+    "learned_costs",
     "linuxtime",
     "LinuxTimeCM",
+    "load_cores",
     "logdecorate",
     "memoize",
     "moduleexport",
+    "needs_pmf",
+    "NeedsDistribution",
     "NoOutput",
+    "ParsedResultCache",
     "pi_for_cpu_load",
+    "pi_for_cpu_load_vectorized",
+    "pi_hits",
+    "pi_hits_vectorized",
+    "pi_task_calls",
+    "pooled_session",
     "polyroot",
     "portable_timing",
     "probneeds",
+    "probneeds_approx",
+    "probneeds_estimate",
+    "probneeds_levels",
     "probneeds_new",
+    "probneeds_quantile",
     "probneeds_rec",
+    "probneeds_scenarios",
+    "recommended_how",
     "recurse_files_in_folder",
     "run_grouped",
+    "run_grouped_as_completed",
+    "scan_files",
     "setuplogger",
+    "SharedResult",
+    "shutdown_executors",
+    "spawn_seeds",
     "timing_process_time",
     "timing_thread_time",
     "timing_wall",
     "TimingCM",
     "thread_native_id_filter",
+    "update_snapshot",
+    "warmup_executor",
 ]
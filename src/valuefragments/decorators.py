@@ -2,14 +2,24 @@
 
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import hashlib
 import logging
+import math
 import os
+import pickle  # nosec B403 - only for own cache content
+import sqlite3
+import threading
 import time
-from functools import wraps
+from collections import OrderedDict
+from contextlib import closing
+from functools import partial, update_wrapper, wraps
 
 # no longer use that from asyncio as deprecated from 3.14
-from inspect import iscoroutinefunction
+from inspect import getsource, iscoroutinefunction
 from types import FunctionType  # , CoroutineType
+from typing import overload
 
 # typing with the help of
 # <https://mypy.readthedocs.io/en/stable/generics.html#declaring-decorators>
@@ -25,6 +35,7 @@ from .valuetyping import (  # Coroutine,; TypeGuard,
     Any,
     Callable,
     Coroutine,
+    Hashable,
     Literal,
     NamedTuple,
     TypeIs,
@@ -504,24 +515,482 @@ class LazyProperty[InstanceObjectT, _FunCallResultT](property):
         super().__init__(_lazy_getterfunction)
 
 
+MemoizePolicy = Literal["LRU", "LFU"]
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a memoized function like functools.lru_cache has."""
+
+    hits: int
+    misses: int
+    maxsize: int | None
+    currsize: int
+
+
+_KWARGS_MARK: object = object()
+_MISSING: Any = object()
+
+
+def _freeze(value: Any) -> Hashable:
+    """Convert (possibly unhashable) value recursively into hashable."""
+    if isinstance(value, dict):
+        return (
+            dict,
+            tuple(
+                sorted(
+                    ((_freeze(key), _freeze(val)) for key, val in value.items()),
+                    key=repr,
+                )
+            ),
+        )
+    if isinstance(value, list | tuple):
+        return (type(value), tuple(_freeze(element) for element in value))
+    if isinstance(value, set | frozenset):
+        return (frozenset, frozenset(_freeze(element) for element in value))
+    if isinstance(value, bytearray):
+        return (bytearray, bytes(value))
+    try:
+        hash(value)
+    except TypeError:
+        return (type(value), repr(value))
+    return cast(Hashable, value)
+
+
+@moduleexport
+def memoize_key(*args: Any, **kwargs: Any) -> Hashable:
+    """Default key function for memoize, unhashable arguments are frozen."""
+    key: tuple[Any, ...] = (
+        (*args, _KWARGS_MARK, *sorted(kwargs.items())) if kwargs else args
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return _freeze(key)
+    return key
+
+
+class _CachedError:  # pylint: disable=too-few-public-methods
+    """Marker for an exception stored in a MemoCache."""
+
+    __slots__: tuple[str] = ("error",)
+
+    def __init__(self, error: BaseException) -> None:
+        """Keep the error."""
+        self.error: BaseException = error
+
+
+class MemoCache[ValueT]:
+    """Bounded and thread-safe storage with LRU/LFU and TTL eviction."""
+
+    __slots__: tuple[str, ...] = (
+        "_data",
+        "_minuse",
+        "_uses",
+        "_usesbuckets",
+        "hits",
+        "lock",
+        "maxsize",
+        "misses",
+        "policy",
+        "ttl",
+    )
+
+    def __init__(
+        self,
+        maxsize: int | None = None,
+        ttl: float | None = None,
+        policy: MemoizePolicy = "LRU",
+    ) -> None:
+        """Prepare empty storage, maxsize None means unbounded."""
+        if policy not in ("LRU", "LFU"):
+            raise ValueError(f"policy was {policy!r} but needs to be 'LRU' or 'LFU'.")
+        self.maxsize: int | None = maxsize
+        self.ttl: float | None = ttl
+        self.policy: MemoizePolicy = policy
+        # key -> (expiry in monotonic seconds, value)
+        self._data: OrderedDict[Hashable, tuple[float, ValueT]] = OrderedDict()
+        self._uses: dict[Hashable, int] = {}
+        # LFU: use count -> keys with that count, oldest first
+        self._usesbuckets: dict[int, OrderedDict[Hashable, None]] = {}
+        self._minuse: int = 1
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock: threading.RLock = threading.RLock()
+
+    def lookup(self, key: Hashable) -> ValueT:
+        """Return cached value or _MISSING, caller needs to hold lock."""
+        entry: tuple[float, ValueT] | None = self._data.get(key)
+        if entry is None:
+            return cast(ValueT, _MISSING)
+        if entry[0] <= time.monotonic():
+            self._discard(key)
+            return cast(ValueT, _MISSING)
+        if self.policy == "LRU":
+            self._data.move_to_end(key)
+        else:
+            self._touch(key)
+        return entry[1]
+
+    def store(self, key: Hashable, value: ValueT) -> None:
+        """Save value and evict if necessary, caller needs to hold lock."""
+        if self.maxsize is not None and self.maxsize <= 0:
+            return
+        self._discard(key)
+        if self.maxsize is not None and len(self._data) >= self.maxsize:
+            self._purge_expired()
+            while len(self._data) >= self.maxsize:
+                self._discard(self._victim())
+        self._data[key] = (
+            math.inf if self.ttl is None else time.monotonic() + self.ttl,
+            value,
+        )
+        self._uses[key] = 1
+        self._usesbuckets.setdefault(1, OrderedDict())[key] = None
+        self._minuse = 1
+
+    def _touch(self, key: Hashable) -> None:
+        """Move key into the bucket of the next higher use count."""
+        uses: int = self._uses[key]
+        bucket: OrderedDict[Hashable, None] = self._usesbuckets[uses]
+        del bucket[key]
+        if not bucket:
+            del self._usesbuckets[uses]
+            if self._minuse == uses:
+                self._minuse = uses + 1
+        self._uses[key] = uses + 1
+        self._usesbuckets.setdefault(uses + 1, OrderedDict())[key] = None
+
+    def _victim(self) -> Hashable:
+        """Key to evict next."""
+        if self.policy == "LRU":
+            return next(iter(self._data))
+        # _minuse may be stale after expiry, distinct counts are few
+        if self._minuse not in self._usesbuckets:
+            self._minuse = min(self._usesbuckets)
+        # ties are broken by the time the count was reached
+        return next(iter(self._usesbuckets[self._minuse]))
+
+    def _purge_expired(self) -> None:
+        """Remove all entries beyond their time to live."""
+        if self.ttl is None:
+            return
+        now: float = time.monotonic()
+        for key in [key for key, entry in self._data.items() if entry[0] <= now]:
+            self._discard(key)
+
+    def _discard(self, key: Hashable) -> None:
+        """Remove key if present."""
+        self._data.pop(key, None)
+        if (uses := self._uses.pop(key, None)) is not None:
+            bucket: OrderedDict[Hashable, None] = self._usesbuckets[uses]
+            del bucket[key]
+            if not bucket:
+                del self._usesbuckets[uses]
+
+    def info(self) -> CacheInfo:
+        """Return hit and miss statistics."""
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def clear(self) -> None:
+        """Drop all entries and reset statistics."""
+        with self.lock:
+            self._data.clear()
+            self._uses.clear()
+            self._usesbuckets.clear()
+            self._minuse = 1
+            self.hits = self.misses = 0
+
+
+def _memo_cached[T](cache: MemoCache[T], key: Hashable) -> T:
+    """Return cached value, _MISSING or raise cached error, lock is held."""
+    result: T = cache.lookup(key)
+    if isinstance(result, _CachedError):
+        cache.hits += 1
+        raise result.error
+    if result is not _MISSING:
+        cache.hits += 1
+    return result
+
+
+def _memoize_sync[**ParamP, T](
+    thefunc: Callable[ParamP, T],
+    cache: MemoCache[T],
+    keyfunc: Callable[..., Hashable],
+    cache_errors: bool,
+) -> Callable[ParamP, T]:
+    """Caching wrapper for plain functions, concurrent misses call once."""
+    inflight: dict[Hashable, concurrent.futures.Future[T]] = {}
+
+    def wrapper(*args: ParamP.args, **kwargs: ParamP.kwargs) -> T:
+        """Return cached result or calculate it once for all callers."""
+        key: Hashable = keyfunc(*args, **kwargs)
+        with cache.lock:
+            if (result := _memo_cached(cache, key)) is not _MISSING:
+                return result
+            pending: concurrent.futures.Future[T] | None = inflight.get(key)
+            if pending is not None:
+                cache.hits += 1
+            else:
+                cache.misses += 1
+                inflight[key] = concurrent.futures.Future()
+        if pending is not None:
+            return pending.result()
+        try:
+            result = thefunc(*args, **kwargs)
+        except BaseException as theerr:
+            with cache.lock:
+                if cache_errors and isinstance(theerr, Exception):
+                    cache.store(key, cast(T, _CachedError(theerr)))
+                inflight.pop(key).set_exception(theerr)
+            raise
+        with cache.lock:
+            cache.store(key, result)
+            inflight.pop(key).set_result(result)
+        return result
+
+    return wrapper
+
+
+def _memoize_async[**ParamP, T](
+    thefunc: Callable[ParamP, Coroutine[Any, Any, T]],
+    cache: MemoCache[T],
+    keyfunc: Callable[..., Hashable],
+    cache_errors: bool,
+) -> Callable[ParamP, T]:
+    """Caching wrapper for async def functions, concurrent awaits share a Task."""
+    tasks: dict[Hashable, asyncio.Task[Any]] = {}
+
+    def settle(key: Hashable, task: asyncio.Task[Any]) -> None:
+        """Move result of finished task into cache."""
+        with cache.lock:
+            if tasks.get(key) is task:
+                del tasks[key]
+            if task.cancelled():
+                return
+            if (theerr := task.exception()) is None:
+                cache.store(key, task.result())
+            elif cache_errors and isinstance(theerr, Exception):
+                cache.store(key, cast(T, _CachedError(theerr)))
+
+    async def awrapper(*args: ParamP.args, **kwargs: ParamP.kwargs) -> Any:
+        """Return cached result or await one shared Task."""
+        key: Hashable = keyfunc(*args, **kwargs)
+        with cache.lock:
+            if (result := _memo_cached(cache, key)) is not _MISSING:
+                return result
+            task: asyncio.Task[Any] | None = tasks.get(key)
+            if task is not None and task.get_loop() is asyncio.get_running_loop():
+                cache.hits += 1
+            else:
+                cache.misses += 1
+                task = tasks[key] = asyncio.ensure_future(thefunc(*args, **kwargs))
+                task.add_done_callback(partial(settle, key))
+        # shield: a cancelled caller must not cancel the other awaiters
+        return await asyncio.shield(task)
+
+    return cast(Callable[ParamP, T], awrapper)
+
+
+@overload
+def memoize[**ParamP, T](
+    func: Callable[ParamP, T],
+    /,
+) -> Callable[ParamP, T]: ...
+
+
+@overload
+def memoize[**ParamP, T](
+    func: None = None,
+    /,
+    *,
+    maxsize: int | None = None,
+    ttl: float | None = None,
+    policy: MemoizePolicy = "LRU",
+    keyfunc: Callable[..., Hashable] = memoize_key,
+    cache_errors: bool = False,
+) -> Callable[[Callable[ParamP, T]], Callable[ParamP, T]]: ...
+
+
 @moduleexport
-def memoize[*_ParamTupleTs, _FunCallResultT](
-    func: Callable[[*_ParamTupleTs], _FunCallResultT],
-) -> Callable[[*_ParamTupleTs], _FunCallResultT]:
+def memoize[**ParamP, T](
+    func: Callable[ParamP, T] | None = None,
+    /,
+    *,
+    maxsize: int | None = None,
+    ttl: float | None = None,
+    policy: MemoizePolicy = "LRU",
+    keyfunc: Callable[..., Hashable] = memoize_key,
+    cache_errors: bool = False,
+) -> Callable[ParamP, T] | Callable[[Callable[ParamP, T]], Callable[ParamP, T]]:
     """decorater for caching calls
     thanks to
     <https://towardsdatascience.com/python-decorators-for-data-science-6913f717669a#879f>
     <https://towardsdatascience.com/12-python-decorators-to-take-your-code-to-the-next-level-a910a1ab3e99>
+
+    Usable bare (@memoize, unbounded) or with arguments like
+    @memoize(maxsize=128, ttl=60, policy="LFU").
+    Concurrent misses on the same key only call func once.
+    For async def functions the result is cached and concurrent awaits
+    share one Task.
+    With cache_errors exceptions are cached (and reraised) like results.
+    The wrapper offers cache_info() and cache_clear().
     """
-    cache: dict[tuple[*_ParamTupleTs], _FunCallResultT] = {}
 
-    # @wraps(func)
-    def wrapper(*args: *_ParamTupleTs) -> _FunCallResultT:
-        """ """
-        if args in cache:
-            return cache[args]
-        result: _FunCallResultT = func(*args)
-        cache[args] = result
-        return result
+    def decorating(thefunc: Callable[ParamP, T]) -> Callable[ParamP, T]:
+        """Build the caching wrapper."""
+        cache: MemoCache[T] = MemoCache(maxsize=maxsize, ttl=ttl, policy=policy)
+        wrapper: Callable[ParamP, T] = (
+            _memoize_async(thefunc, cache, keyfunc, cache_errors)
+            if istypedcoroutinefunction(thefunc)
+            else _memoize_sync(thefunc, cache, keyfunc, cache_errors)
+        )
+        update_wrapper(wrapper, thefunc)
+        wrapper.cache_info = cache.info  # type: ignore[attr-defined]
+        wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+        return wrapper
 
-    return wrapper
+    return decorating if func is None else decorating(func)
+
+
+def function_identity(func: Callable[..., Any]) -> tuple[str, str, str | bytes]:
+    """Module, qualified name and source (bytecode as fallback) of func."""
+    try:
+        source: str | bytes = getsource(func)
+    except (OSError, TypeError):
+        source = getattr(getattr(func, "__code__", None), "co_code", b"")
+    return func.__module__, func.__qualname__, source
+
+
+_pickled: Callable[[Any], bytes] = partial(
+    pickle.dumps, protocol=pickle.HIGHEST_PROTOCOL
+)
+
+
+def _canonical(value: Any) -> Any:
+    """Equal values to equal nested tuples, sets and dicts in a fixed order."""
+    if isinstance(value, dict):
+        return (
+            dict,
+            tuple(
+                sorted(
+                    ((_canonical(key), _canonical(val)) for key, val in value.items()),
+                    key=_pickled,
+                )
+            ),
+        )
+    if isinstance(value, list | tuple):
+        return (type(value), tuple(_canonical(element) for element in value))
+    if isinstance(value, set | frozenset):
+        return (
+            frozenset,
+            tuple(sorted((_canonical(element) for element in value), key=_pickled)),
+        )
+    return value
+
+
+def stable_call_hash(
+    identity: tuple[str, str, str | bytes],
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> str:
+    """Hash over function identity and arguments, stable across processes.
+
+    Equal arguments give equal hashes regardless of hash seed (set order)
+    and dict insertion order."""
+    return hashlib.sha256(
+        _pickled((identity, _canonical(args), _canonical(kwargs))),
+        usedforsecurity=False,
+    ).hexdigest()
+
+
+@moduleexport
+class SqliteStore:
+    """Pickled values in a SQLite file, usable by many processes at once."""
+
+    __slots__: tuple[str, str] = ("_prepared", "dbpath")
+
+    def __init__(self, dbpath: str) -> None:
+        """Remember dbpath, the file is only created on first use."""
+        self.dbpath: str = dbpath
+        self._prepared: bool = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """New connection, so no connection is shared by threads or forks.
+
+        The first one creates the table if needed, WAL allows concurrent
+        readers and writer."""
+        connection: sqlite3.Connection = sqlite3.connect(self.dbpath, timeout=60)
+        if not self._prepared:
+            with connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS memo ("
+                    "key TEXT PRIMARY KEY, funcname TEXT, created REAL, value BLOB)"
+                )
+            self._prepared = True
+        return connection
+
+    def get(self, key: str, max_age_seconds: float) -> Any:
+        """Return value or _MISSING if absent or not younger than max_age_seconds."""
+        with closing(self._connect()) as connection:
+            row: tuple[float, bytes] | None = connection.execute(
+                "SELECT created, value FROM memo WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[0] >= max_age_seconds:
+            return _MISSING
+        return pickle.loads(row[1])  # nosec B301 - only own cache content
+
+    def put(self, key: str, funcname: str, value: Any) -> None:
+        """Save value with current timestamp."""
+        payload: bytes = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?)",
+                (key, funcname, time.time(), payload),
+            )
+
+    def clear(self, funcname: str | None = None) -> None:
+        """Drop entries of one function or all."""
+        with closing(self._connect()) as connection, connection:
+            if funcname is None:
+                connection.execute("DELETE FROM memo")
+            else:
+                connection.execute("DELETE FROM memo WHERE funcname = ?", (funcname,))
+
+
+@moduleexport
+def diskmemoize[**ParamP, T](
+    dbpath: str = "memoize.sqlite",
+    max_age_seconds: float = 60 * 60 * 24 * 7,
+) -> Callable[[Callable[ParamP, T]], Callable[ParamP, T]]:
+    """decorator for caching calls in a file shared by processes and restarts.
+
+    Entries are current like in file_exists_current, i.e. younger than
+    max_age_seconds. Arguments and results need to be picklable.
+    dbpath is only created by the first call.
+    Combine with memoize as fast in-memory tier in front:
+    @memoize(maxsize=128)
+    @diskmemoize("cache.sqlite")
+    """
+    store: SqliteStore = SqliteStore(dbpath)
+
+    def decorating(thefunc: Callable[ParamP, T]) -> Callable[ParamP, T]:
+        """Build the caching wrapper."""
+        identity: tuple[str, str, str | bytes] = function_identity(thefunc)
+        funcname: str = f"{identity[0]}.{identity[1]}"
+
+        def wrapper(*args: ParamP.args, **kwargs: ParamP.kwargs) -> T:
+            """Return stored result or calculate and store it."""
+            key: str = stable_call_hash(identity, args, kwargs)
+            result: T = store.get(key, max_age_seconds)
+            if result is _MISSING:
+                result = thefunc(*args, **kwargs)
+                store.put(key, funcname, result)
+            return result
+
+        update_wrapper(wrapper, thefunc)
+        wrapper.cache_clear = partial(store.clear, funcname)  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorating
@@ -3,43 +3,68 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
 import concurrent.futures
+import fnmatch
+import gzip
 import hashlib
+import itertools
+import json
 import logging
 import math
+import multiprocessing
 import os
 import random
+import re
+import secrets
+import stat
 import string
 import sys
+import tempfile
 import threading
 import time
+import urllib.parse
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from functools import cache, partial
 from io import IOBase
-from shutil import copyfileobj
+from multiprocessing import resource_tracker, shared_memory
 from types import ModuleType
 
 import requests
+import requests.adapters
 
 from .moduletools import moduleexport
 from .valuetyping import (
     TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
     Callable,
     Generator,
+    Iterable,
+    Iterator,
     KwargsForPrint,
     Literal,
+    NamedTuple,
     Protocol,
     Self,
+    Sequence,
     SupportsIndex,
     SupportsInt,
+    cast,
     reveal_type,
 )
 
-fromstring = __import__(name="lxml.html", fromlist="fromstring").fromstring
 __all__: list[str] = []
 
 # noinspection PyProtectedMember
 # pylint: disable-next=no-name-in-module
 # pyright: ignore[reportAttributeAccessIssue,reportUnknownVariableType]
 # from lxml.html import fromstring
+# lxml is imported in getselectedhreflinks only, so workers and
+# sub-interpreters importing this module do not need it.
 
 
 # https://docs.python.org/3/library/__future__.html
@@ -50,6 +75,11 @@ if TYPE_CHECKING:
     from _typeshed import ReadableBuffer, SupportsTrunc
 thelogger: logging.Logger = logging.getLogger(__name__)
 
+try:
+    import fcntl
+except ImportError:  # not on Windows, locking only between threads then
+    fcntl = None  # type: ignore[assignment]
+
 
 class Printable(Protocol):  # pylint: disable=too-few-public-methods
     """Typing Protocol for objects with __str__ method."""
@@ -83,24 +113,438 @@ def file_exists_current(
     )
 
 
+_MISSING: Any = object()
+_filecache_locks: dict[str, threading.Lock] = {}
+_filecache_locks_guard: threading.Lock = threading.Lock()
+_filecache_background: set[str] = set()
+_filecache_tasks: set[asyncio.Task[None]] = set()
+
+
+@contextmanager
+def _refresh_lock(filepathname: str, blocking: bool = True) -> Iterator[bool]:
+    """Per path lock for threads and (via fcntl where available) processes.
+
+    Yields if the lock was acquired, which is always the case if blocking."""
+    with _filecache_locks_guard:
+        threadlock: threading.Lock = _filecache_locks.setdefault(
+            os.path.abspath(filepathname), threading.Lock()
+        )
+    if not threadlock.acquire(blocking=blocking):
+        yield False
+        return
+    try:
+        if fcntl is None:
+            yield True
+            return
+        with open(f"{filepathname}.lock", "wb") as lockfile:
+            try:
+                fcntl.flock(
+                    lockfile,
+                    fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB,
+                )
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+    finally:
+        threadlock.release()
+
+
+@cache
+def _umask() -> int:
+    """Process umask, os.umask can only be read by setting it."""
+    themask: int = os.umask(0o022)
+    os.umask(themask)
+    return themask
+
+
+def _newfile_mode(filepathname: str) -> int:
+    """Permissions of existing filepathname or those open() would give."""
+    try:
+        return stat.S_IMODE(os.stat(filepathname).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_umask()
+
+
+@moduleexport
+def atomic_write(filepathname: str, chunks: Iterable[bytes]) -> None:
+    """Write chunks into temporary file and rename that to filepathname.
+
+    Readers see either the old or the new complete file, never a partial one."""
+    fd, tmpname = tempfile.mkstemp(
+        dir=os.path.dirname(filepathname) or ".",
+        prefix=f"{os.path.basename(filepathname)}.",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "wb") as thefile:
+            for chunk in chunks:
+                thefile.write(chunk)
+        # mkstemp creates 0600, keep the mode of the file being replaced
+        os.chmod(tmpname, _newfile_mode(filepathname))
+        os.replace(tmpname, filepathname)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+def _iterfileobj(thesrc: IOBase, chunklen: int = 128 * 2**12) -> Iterator[bytes]:
+    """Read binary stream chunkwise."""
+    while chunk := thesrc.read(chunklen):
+        yield chunk
+
+
+def _refresh_http(
+    filepathname: str,
+    theurl: str,
+    thetimeout: int | tuple[int, int],
+) -> None:
+    """Download theurl to filepathname, revalidating by ETag/Last-Modified."""
+    metapathname: str = f"{filepathname}.meta"
+    validators: dict[str, str] = {}
+    if os.path.exists(filepathname) and os.path.exists(metapathname):
+        with open(metapathname, encoding="utf-8") as metafile:
+            validators = json.load(metafile)
+    theheaders: dict[str, str] = {}
+    if "ETag" in validators:
+        theheaders["If-None-Match"] = validators["ETag"]
+    if "Last-Modified" in validators:
+        theheaders["If-Modified-Since"] = validators["Last-Modified"]
+    with requests.get(
+        url=theurl, headers=theheaders, stream=True, timeout=thetimeout
+    ) as theresponse:
+        if theresponse.status_code == 304:
+            os.utime(filepathname)
+            thelogger.info("File %s revalidated (304).", filepathname)
+            return
+        theresponse.raise_for_status()
+        atomic_write(filepathname, theresponse.iter_content(chunk_size=128 * 2**12))
+        atomic_write(
+            metapathname,
+            [
+                json.dumps(
+                    {
+                        name: theresponse.headers[name]
+                        for name in ("ETag", "Last-Modified")
+                        if name in theresponse.headers
+                    }
+                ).encode()
+            ],
+        )
+
+
+def _filecache_refresh(
+    filepathname: str,
+    genupdmeth: Callable[[], IOBase] | str,
+    max_age_seconds: int,
+    thetimeout: int | tuple[int, int],
+    blocking: bool,
+) -> None:
+    """Update filepathname under its lock unless another caller did."""
+    with _refresh_lock(filepathname, blocking=blocking) as acquired:
+        # another caller might have refreshed while we waited
+        if acquired and not file_exists_current(filepathname, max_age_seconds):
+            if isinstance(genupdmeth, str):
+                _refresh_http(filepathname, genupdmeth, thetimeout)
+            else:
+                with genupdmeth() as thesrc:
+                    atomic_write(filepathname, _iterfileobj(thesrc))
+            thelogger.info("File %s refreshed.", filepathname)
+
+
+def _filecache_background_refresh(
+    filepathname: str,
+    genupdmeth: Callable[[], IOBase] | str,
+    max_age_seconds: int,
+    thetimeout: int | tuple[int, int],
+) -> None:
+    """Refresh without blocking and only log errors, for background use."""
+    try:
+        _filecache_refresh(
+            filepathname, genupdmeth, max_age_seconds, thetimeout, blocking=False
+        )
+    except Exception:  # pylint: disable=broad-exception-caught
+        thelogger.exception("Background refresh of %s failed.", filepathname)
+    finally:
+        with _filecache_locks_guard:
+            _filecache_background.discard(filepathname)
+
+
+def _filecache_claim_background(filepathname: str) -> bool:
+    """Return True if no background refresh is running for filepathname."""
+    with _filecache_locks_guard:
+        if filepathname in _filecache_background:
+            return False
+        _filecache_background.add(filepathname)
+        return True
+
+
+_FilecachePlan = Literal["current", "background", "blocking", "nonblocking"]
+
+
+def _filecache_plan(
+    filepathname: str,
+    max_age_seconds: int,
+    background: bool,
+    max_stale_seconds: int | None,
+) -> _FilecachePlan:
+    """Decide how filecache has to handle the file at filepathname."""
+    if file_exists_current(filepathname, max_age_seconds):
+        return "current"
+    servable: bool = (
+        os.path.exists(filepathname)
+        if max_stale_seconds is None
+        else file_exists_current(filepathname, max_age_seconds + max_stale_seconds)
+    )
+    if not servable:
+        return "blocking"
+    return "background" if background else "nonblocking"
+
+
+@moduleexport
+class ParsedResultCache:
+    """Processed file contents kept in memory for filecache.
+
+    An entry is valid while (mtime_ns, size, inode) of the file match,
+    so a hit costs only one os.stat. Entries are keyed by path and procmeth
+    (use the same procmeth object, not a new lambda per call).
+    Least recently used entries are evicted above maxentries or if the
+    summed file sizes (as estimate for the memory) exceed maxbytes."""
+
+    __slots__: tuple[str, ...] = (
+        "_entries",
+        "_lock",
+        "currbytes",
+        "maxbytes",
+        "maxentries",
+    )
+
+    def __init__(self, maxentries: int = 32, maxbytes: int = 256 * 2**20) -> None:
+        """Prepare empty cache."""
+        self.maxentries: int = maxentries
+        self.maxbytes: int = maxbytes
+        self.currbytes: int = 0
+        self._entries: OrderedDict[
+            tuple[str, Callable[[str], Any]], tuple[tuple[int, int, int], Any]
+        ] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(
+        self,
+        filepathname: str,
+        procmeth: Callable[[str], Any],
+        thestat: os.stat_result,
+    ) -> Any:
+        """Return cached result for unchanged file or _MISSING."""
+        with self._lock:
+            entry: tuple[tuple[int, int, int], Any] | None = self._entries.get(
+                (filepathname, procmeth)
+            )
+            if entry is None or entry[0] != (
+                thestat.st_mtime_ns,
+                thestat.st_size,
+                thestat.st_ino,
+            ):
+                return _MISSING
+            self._entries.move_to_end((filepathname, procmeth))
+            return entry[1]
+
+    def put(
+        self,
+        filepathname: str,
+        procmeth: Callable[[str], Any],
+        thestat: os.stat_result,
+        result: Any,
+    ) -> None:
+        """Save result for file in given state and evict if necessary."""
+        if thestat.st_size > self.maxbytes:
+            return
+        with self._lock:
+            self._discard((filepathname, procmeth))
+            self._entries[(filepathname, procmeth)] = (
+                (thestat.st_mtime_ns, thestat.st_size, thestat.st_ino),
+                result,
+            )
+            self.currbytes += thestat.st_size
+            while (
+                len(self._entries) > self.maxentries or self.currbytes > self.maxbytes
+            ):
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: tuple[str, Callable[[str], Any]]) -> None:
+        """Remove entry if present, caller holds lock."""
+        entry: tuple[tuple[int, int, int], Any] | None = self._entries.pop(key, None)
+        if entry is not None:
+            self.currbytes -= entry[0][1]
+
+    def process[_FunCallResultT](
+        self, filepathname: str, procmeth: Callable[[str], _FunCallResultT]
+    ) -> _FunCallResultT:
+        """Return cached result or procmeth(filepathname)."""
+        # stat before processing, a file replaced meanwhile is just a miss later
+        thestat: os.stat_result = os.stat(filepathname)
+        result: _FunCallResultT = self.get(filepathname, procmeth, thestat)
+        if result is _MISSING:
+            result = procmeth(filepathname)
+            self.put(filepathname, procmeth, thestat, result)
+        return result
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.currbytes = 0
+
+
+def _resultcache_hit(
+    filepathname: str,
+    procmeth: Callable[[str], Any],
+    max_age_seconds: int,
+    resultcache: ParsedResultCache,
+) -> Any:
+    """Cached result of a current file with only one os.stat or _MISSING."""
+    try:
+        thestat: os.stat_result = os.stat(filepathname)
+    except FileNotFoundError:
+        return _MISSING
+    if time.time() - thestat.st_mtime >= max_age_seconds:
+        return _MISSING
+    return resultcache.get(filepathname, procmeth, thestat)
+
+
 @moduleexport
 def filecache[_FunCallResultT](
     filepathname: str,
-    genupdmeth: Callable[[], IOBase],
+    genupdmeth: Callable[[], IOBase] | str,
     procmeth: Callable[[str], _FunCallResultT],
     max_age_seconds: int = 60 * 60 * 24 * 7,
+    thetimeout: int | tuple[int, int] = (5, 10),
+    *,
+    background: bool = False,
+    max_stale_seconds: int | None = None,
+    resultcache: ParsedResultCache | None = None,
 ) -> _FunCallResultT:
     """Check if cachefile exists and current.
     Updates if neccesary.
-    Returns processed content."""
-    if not file_exists_current(filepathname, max_age_seconds):
-        with open(filepathname, "wb") as thefile:
-            with genupdmeth() as thesrc:
-                copyfileobj(thesrc, thefile)
-        thelogger.info("File %s refreshed.", filepathname)
+    Returns processed content.
+
+    genupdmeth gives a binary stream or is an URL, then ETag/Last-Modified
+    are kept in filepathname.meta for conditional requests.
+    The update goes to a temporary file which replaces filepathname only
+    when complete. Only one refresher per path runs, meanwhile other
+    callers process the existing (stale) file.
+    With background the stale file is processed at once and refreshed in
+    a thread (stale-while-revalidate). Files older than max_age_seconds +
+    max_stale_seconds are never served stale, callers wait for the update.
+    A resultcache skips procmeth as long as the file is unchanged."""
+    if resultcache is not None:
+        result: _FunCallResultT = _resultcache_hit(
+            filepathname, procmeth, max_age_seconds, resultcache
+        )
+        if result is not _MISSING:
+            return result
+    match _filecache_plan(filepathname, max_age_seconds, background, max_stale_seconds):
+        case "background":
+            if _filecache_claim_background(filepathname):
+                threading.Thread(
+                    target=_filecache_background_refresh,
+                    args=(filepathname, genupdmeth, max_age_seconds, thetimeout),
+                    daemon=True,
+                ).start()
+        case "blocking" | "nonblocking" as plan:
+            _filecache_refresh(
+                filepathname,
+                genupdmeth,
+                max_age_seconds,
+                thetimeout,
+                blocking=plan == "blocking",
+            )
+    if resultcache is not None:
+        return resultcache.process(filepathname, procmeth)
     return procmeth(filepathname)
 
 
+def _filecache_hit_or_plan(  # pylint: disable=too-many-arguments
+    filepathname: str,
+    procmeth: Callable[[str], Any],
+    max_age_seconds: int,
+    background: bool,
+    max_stale_seconds: int | None,
+    resultcache: ParsedResultCache | None,
+) -> tuple[Any, _FilecachePlan | None]:
+    """Cached result (plan None) or _MISSING and the plan, for one thread hop."""
+    if resultcache is not None:
+        result: Any = _resultcache_hit(
+            filepathname, procmeth, max_age_seconds, resultcache
+        )
+        if result is not _MISSING:
+            return result, None
+    return _MISSING, _filecache_plan(
+        filepathname, max_age_seconds, background, max_stale_seconds
+    )
+
+
+@moduleexport
+async def afilecache[_FunCallResultT](
+    filepathname: str,
+    genupdmeth: Callable[[], IOBase] | str,
+    procmeth: Callable[[str], _FunCallResultT],
+    max_age_seconds: int = 60 * 60 * 24 * 7,
+    thetimeout: int | tuple[int, int] = (5, 10),
+    *,
+    background: bool = False,
+    max_stale_seconds: int | None = None,
+    resultcache: ParsedResultCache | None = None,
+) -> _FunCallResultT:
+    """Async filecache, disk and network work is done in threads.
+
+    With background the refresh runs as asyncio task. A resultcache hit
+    needs one thread hop and one os.stat like filecache."""
+    result: _FunCallResultT
+    plan: _FilecachePlan | None
+    result, plan = await asyncio.to_thread(
+        _filecache_hit_or_plan,
+        filepathname,
+        procmeth,
+        max_age_seconds,
+        background,
+        max_stale_seconds,
+        resultcache,
+    )
+    match plan:
+        case None:
+            return result
+        case "background":
+            if _filecache_claim_background(filepathname):
+                thetask: asyncio.Task[None] = asyncio.create_task(
+                    asyncio.to_thread(
+                        _filecache_background_refresh,
+                        filepathname,
+                        genupdmeth,
+                        max_age_seconds,
+                        thetimeout,
+                    )
+                )
+                # keep reference, see asyncio.create_task documentation
+                _filecache_tasks.add(thetask)
+                thetask.add_done_callback(_filecache_tasks.discard)
+        case "blocking" | "nonblocking" as plan:
+            await asyncio.to_thread(
+                _filecache_refresh,
+                filepathname,
+                genupdmeth,
+                max_age_seconds,
+                thetimeout,
+                blocking=plan == "blocking",
+            )
+    if resultcache is not None:
+        return await asyncio.to_thread(resultcache.process, filepathname, procmeth)
+    return await asyncio.to_thread(procmeth, filepathname)
+
+
 @moduleexport
 def thread_native_id_filter(record: logging.LogRecord) -> bool:
     """Inject thread_id to log records"""
@@ -109,21 +553,108 @@ def thread_native_id_filter(record: logging.LogRecord) -> bool:
 
 
 @moduleexport
-def pi_for_cpu_load(
+def pi_hits(
     numiter: int = 10**7,
     theseed: None | int | float | str | bytes | bytearray = None,
-) -> float:
-    """Calculate pi by simulation just for CPU-load."""
-    random.seed(theseed)
-    n_all: int = 0
+) -> int:
+    """Count random points of the unit square within the quarter circle.
+
+    Uses an own random.Random, so parallel calls do not interfere."""
+    rng: random.Random = random.Random(theseed)  # nosec: B311
     n_in: int = 0
     for _ in range(numiter):
-        _x: float = random.uniform(0, 1)  # nosec: B311
-        _y: float = random.uniform(0, 1)  # nosec: B311
-        n_all += 1
+        _x: float = rng.uniform(0, 1)
+        _y: float = rng.uniform(0, 1)
         if _x**2 + _y**2 < 1:
             n_in += 1
-    return 4 * n_in / n_all
+    return n_in
+
+
+@moduleexport
+def pi_for_cpu_load(
+    numiter: int = 10**7,
+    theseed: None | int | float | str | bytes | bytearray = None,
+) -> float:
+    """Calculate pi by simulation just for CPU-load."""
+    return 4 * pi_hits(numiter, theseed) / numiter
+
+
+@moduleexport
+def pi_hits_vectorized(
+    numiter: int = 10**7,
+    theseed: int | None = None,
+    blocksize: int = 2**16,
+) -> int:
+    """Count hits as pi_hits, with numpy in blocks of reused buffers.
+
+    Reproducible for given theseed (numpy.random.default_rng), but other
+    values than pi_hits. Raises ImportError without numpy."""
+    numpy: ModuleType = __import__(name="numpy")
+    rng: Any = numpy.random.default_rng(theseed)
+    blocksize = max(1, min(blocksize, numiter))
+    # x and y interleaved, so the result does not depend on blocksize
+    points: Any = numpy.empty(2 * blocksize)
+    radii: Any = numpy.empty(blocksize)
+    inside: Any = numpy.empty(blocksize, dtype=bool)
+    n_in: int = 0
+    for blockstart in range(0, numiter, blocksize):
+        size: int = min(blocksize, numiter - blockstart)
+        block: Any = points[: 2 * size]
+        rng.random(out=block)
+        numpy.square(block, out=block)
+        numpy.add(block[0::2], block[1::2], out=radii[:size])
+        numpy.less(radii[:size], 1, out=inside[:size])
+        n_in += int(numpy.count_nonzero(inside[:size]))
+    return n_in
+
+
+@moduleexport
+def pi_for_cpu_load_vectorized(
+    numiter: int = 10**7,
+    theseed: int | None = None,
+    blocksize: int = 2**16,
+) -> float:
+    """Calculate pi by simulation with numpy, see pi_hits_vectorized."""
+    return 4 * pi_hits_vectorized(numiter, theseed, blocksize) / numiter
+
+
+@moduleexport
+def spawn_seeds(
+    theseed: None | int | float | str | bytes | bytearray, count: int
+) -> list[int]:
+    """Derive count independent 64 bit seeds from theseed (fresh if None)."""
+    base: str = repr(secrets.randbits(128) if theseed is None else theseed)
+    return [
+        int.from_bytes(
+            hashlib.sha256(f"{base}/{index}".encode()).digest()[:8], "little"
+        )
+        for index in range(count)
+    ]
+
+
+@moduleexport
+def pi_task_calls(
+    numiter: int,
+    parts: int,
+    theseed: None | int | float | str | bytes | bytearray = None,
+    vectorized: bool = False,
+) -> list[Callable[[], int]]:
+    """Split a pi simulation into parts calls with own streams for run_grouped.
+
+    Every call returns its hit count, combine_pi_hits gives the exact
+    result of all numiter points, the same in every mode of run_grouped."""
+    counter: Callable[[int, int], int] = pi_hits_vectorized if vectorized else pi_hits
+    share, rest = divmod(numiter, parts)
+    return [
+        partial(counter, share + (index < rest), seed)
+        for index, seed in enumerate(spawn_seeds(theseed, parts))
+    ]
+
+
+@moduleexport
+def combine_pi_hits(hits: Iterable[int], numiter: int) -> float:
+    """Pi estimated from the hit counts of pi_task_calls for numiter points."""
+    return 4 * sum(hits) / numiter
 
 
 @moduleexport
@@ -134,6 +665,158 @@ def recurse_files_in_folder(thebasepath: str) -> Generator[str, None, None]:
             yield os.path.join(root, filename)
 
 
+class FileEntry(NamedTuple):
+    """File found by scan_files with the stat data scandir delivered."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+def _patternmatcher(patterns: Iterable[str] | None) -> Callable[[str], bool] | None:
+    """One compiled regex for several glob patterns like '*.csv'."""
+    thepatterns: list[str] = list(patterns or ())
+    if not thepatterns:
+        return None
+    return cast(
+        Callable[[str], bool],
+        re.compile("|".join(fnmatch.translate(pat) for pat in thepatterns)).match,
+    )
+
+
+def _scan_one_dir(
+    thepath: str,
+    keepfile: Callable[[str], bool],
+    prune: Callable[[str], bool] | None,
+    follow_symlinks: bool,
+) -> tuple[list[FileEntry], list[tuple[str, tuple[int, int] | None]]]:
+    """Files (filtered) and subdirectories (not pruned) of one directory.
+
+    Subdirectories come with (st_dev, st_ino) if symlinks are followed."""
+    files: list[FileEntry] = []
+    subdirs: list[tuple[str, tuple[int, int] | None]] = []
+    try:
+        with os.scandir(thepath) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        if prune is None or not prune(entry.name):
+                            subdirs.append((entry.path, _dirid(entry, follow_symlinks)))
+                    elif entry.is_dir():  # not followed symlink to a directory
+                        continue
+                    elif keepfile(entry.name):
+                        # symlinked files as their readers see them: the target
+                        thestat: os.stat_result = entry.stat()
+                        files.append(
+                            FileEntry(
+                                entry.path,
+                                thestat.st_size,
+                                thestat.st_mtime_ns,
+                                thestat.st_ino if entry.is_symlink() else entry.inode(),
+                            )
+                        )
+                except OSError as theerr:  # vanished, unreadable or dangling entry
+                    thelogger.debug("skipping %s: %s", entry.path, theerr)
+    except OSError as theerr:
+        thelogger.warning("cannot scan %s: %s", thepath, theerr)
+    return files, subdirs
+
+
+def _dirid(
+    entry: os.DirEntry[str] | str, follow_symlinks: bool
+) -> tuple[int, int] | None:
+    """(st_dev, st_ino) of a directory to detect symlink cycles, if needed."""
+    if not follow_symlinks:
+        return None  # without symlinks the tree has no cycles
+    try:
+        thestat: os.stat_result = (
+            os.stat(entry) if isinstance(entry, str) else entry.stat()
+        )
+    except FileNotFoundError:  # reported when scanning it
+        return None
+    return thestat.st_dev, thestat.st_ino
+
+
+@moduleexport
+def scan_files(  # pylint: disable=too-many-arguments
+    thebasepath: str,
+    include: Iterable[str] | None = None,
+    exclude: Iterable[str] | None = None,
+    prune: Iterable[str] | None = None,
+    *,
+    follow_symlinks: bool = False,
+    parallel: int | None = None,
+) -> Generator[FileEntry, None, None]:
+    """Recursivly return FileEntry (path, size, mtime_ns, inode) for files.
+
+    Built on os.scandir so size and time need no second stat call.
+    include/exclude are glob patterns for file names (like '*.csv'),
+    directories whose names match prune are not entered.
+    Symlinked files report the data of their target. With follow_symlinks
+    symlinked directories are entered too, each directory only once.
+    With parallel > 1 directories are listed by that many threads, the
+    order of results then is not deterministic."""
+    includematch: Callable[[str], bool] | None = _patternmatcher(include)
+    excludematch: Callable[[str], bool] | None = _patternmatcher(exclude)
+
+    def keepfile(thename: str) -> bool:
+        """Check file name against include and exclude patterns."""
+        return (includematch is None or bool(includematch(thename))) and (
+            excludematch is None or not excludematch(thename)
+        )
+
+    visited: set[tuple[int, int]] = set()
+
+    def unvisited(subdirs: list[tuple[str, tuple[int, int] | None]]) -> list[str]:
+        """Paths of subdirs not entered yet (via another symlink)."""
+        result: list[str] = []
+        for subdir, dirid in subdirs:
+            if dirid is not None:
+                if dirid in visited:
+                    thelogger.debug("skipping %s: already scanned", subdir)
+                    continue
+                visited.add(dirid)
+            result.append(subdir)
+        return result
+
+    scanner = partial(
+        _scan_one_dir,
+        keepfile=keepfile,
+        prune=_patternmatcher(prune),
+        follow_symlinks=follow_symlinks,
+    )
+    basepaths: list[str] = unvisited(
+        [(thebasepath, _dirid(thebasepath, follow_symlinks))]
+    )
+    if parallel is None or parallel <= 1:
+        stack: list[str] = basepaths
+        while stack:
+            files, subdirs = scanner(stack.pop())
+            yield from files
+            stack.extend(reversed(unvisited(subdirs)))
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=parallel) as executor:
+        pending: set[
+            concurrent.futures.Future[
+                tuple[list[FileEntry], list[tuple[str, tuple[int, int] | None]]]
+            ]
+        ] = {executor.submit(scanner, basepath) for basepath in basepaths}
+        try:
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    files, subdirs = future.result()
+                    pending.update(
+                        executor.submit(scanner, sub) for sub in unvisited(subdirs)
+                    )
+                    yield from files
+        finally:  # consumer might stop early
+            executor.shutdown(cancel_futures=True)
+
+
 @moduleexport
 def basic_auth(
     user: str,
@@ -209,7 +892,10 @@ class HumanReadAble(int):
 
 @moduleexport
 def closeifrunningloky() -> None:
-    """Check if any (loky) backend is still open and if, close."""
+    """Check if any (loky) backend is still open and if, close.
+
+    Shared executors of get_executor are shut down as well."""
+    shutdown_executors()
     try:
         # OLD
         # pylint: disable=import-outside-toplevel
@@ -305,23 +991,347 @@ else:
             psutil.Process().nice(19)
 
 
-@moduleexport
-def hashfile(filename: str, chunklen: int = 128 * 2**12) -> str:
-    """Return md5 hash for file."""
-    with open(filename, "rb") as thefile:
-        # nosec  # Compliant
-        file_hash = hashlib.md5(usedforsecurity=False)
-        while chunk := thefile.read(chunklen):
-            file_hash.update(chunk)
+try:
+    # noinspection PyUnresolvedReferences
+    xxhash: ModuleType | None = __import__(name="xxhash")
+except ImportError:
+    xxhash = None
+
+_hashbuffers: threading.local = threading.local()
+
+
+def _hashfactory(algorithm: str) -> Callable[[], Any]:
+    """Constructor for hashlib algorithms or xxhash ones (xxh64, xxh3_128, ...)."""
+    if algorithm.startswith("xxh"):
+        if xxhash is None:
+            raise ValueError(f"algorithm {algorithm} needs xxhash installed.")
+        return cast(Callable[[], Any], getattr(xxhash, algorithm))
     # deepcode ignore InsecureHash: for file identification
-    return file_hash.hexdigest()
+    return partial(hashlib.new, algorithm, usedforsecurity=False)
+
+
+@moduleexport
+def hashfile(filename: str, chunklen: int = 128 * 2**12, algorithm: str = "md5") -> str:
+    """Return hash (md5 by default) for file.
+
+    Reads by readinto in a per thread reused buffer, so no chunk is
+    allocated."""
+    file_hash = _hashfactory(algorithm)()
+    thebuffer: bytearray | None = getattr(_hashbuffers, "buffer", None)
+    if thebuffer is None or len(thebuffer) != chunklen:
+        thebuffer = _hashbuffers.buffer = bytearray(chunklen)
+    theview: memoryview = memoryview(thebuffer)
+    with open(filename, "rb", buffering=0) as thefile:
+        while readlen := thefile.readinto(theview):
+            file_hash.update(theview[:readlen])
+    return cast(str, file_hash.hexdigest())
+
+
+@moduleexport
+class HashCache:
+    """Sidecar JSON file with hashes keyed by (path, size, mtime_ns, inode).
+
+    Unchanged files need not be read again to know their hash."""
+
+    __slots__: tuple[str, ...] = ("_entries", "_lock", "cachefile")
+
+    def __init__(self, cachefile: str | None = None) -> None:
+        """Load entries from cachefile if existing."""
+        self.cachefile: str | None = cachefile
+        self._entries: dict[str, list[int | str]] = {}
+        self._lock: threading.Lock = threading.Lock()
+        if cachefile is not None and os.path.exists(cachefile):
+            with open(cachefile, encoding="utf-8") as thefile:
+                self._entries = json.load(thefile)
+
+    @staticmethod
+    def _statkey(thestat: os.stat_result, algorithm: str) -> list[int | str]:
+        """Identification of a file state and algorithm."""
+        return [thestat.st_size, thestat.st_mtime_ns, thestat.st_ino, algorithm]
+
+    def get(self, filename: str, thestat: os.stat_result, algorithm: str) -> str | None:
+        """Known hash of file in given state or None."""
+        with self._lock:
+            entry: list[int | str] | None = self._entries.get(filename)
+        if entry is None or entry[:4] != self._statkey(thestat, algorithm):
+            return None
+        return str(entry[4])
+
+    def put(
+        self, filename: str, thestat: os.stat_result, algorithm: str, digest: str
+    ) -> None:
+        """Remember hash of file in given state."""
+        with self._lock:
+            self._entries[filename] = [*self._statkey(thestat, algorithm), digest]
+
+    def hashfile(self, filename: str, algorithm: str = "md5") -> str:
+        """Hash of file, only reading it if changed since cached."""
+        thestat: os.stat_result = os.stat(filename)
+        digest: str | None = self.get(filename, thestat, algorithm)
+        if digest is None:
+            digest = hashfile(filename, algorithm=algorithm)
+            self.put(filename, thestat, algorithm, digest)
+        return digest
+
+    def save(self) -> None:
+        """Write entries atomically to cachefile."""
+        if self.cachefile is not None:
+            with self._lock:
+                payload: bytes = json.dumps(self._entries).encode()
+            atomic_write(self.cachefile, [payload])
+
+
+def _hashfile_or_none(thecache: HashCache, algorithm: str, filename: str) -> str | None:
+    """Hash of file by thecache or None (logged) if it can not be read."""
+    try:
+        return thecache.hashfile(filename, algorithm=algorithm)
+    except OSError:
+        thelogger.warning("Could not hash %s.", filename, exc_info=True)
+        return None
+
+
+@moduleexport
+def hashfiles(
+    filenames: Iterable[str],
+    algorithm: str = "md5",
+    max_workers: int | None = None,
+    cachefile: str | None = None,
+) -> dict[str, str]:
+    """Hash many files in a thread pool, hashlib releases the GIL.
+
+    With cachefile unchanged files are taken from that sidecar cache.
+    Files which can not be read are logged and left out of the result."""
+    thecache: HashCache = HashCache(cachefile)
+    thefilenames: list[str] = list(filenames)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            result: dict[str, str] = {
+                filename: digest
+                for filename, digest in zip(
+                    thefilenames,
+                    executor.map(
+                        partial(_hashfile_or_none, thecache, algorithm), thefilenames
+                    ),
+                    strict=True,
+                )
+                if digest is not None
+            }
+    finally:
+        thecache.save()
+    return result
+
+
+class SnapshotDiff(NamedTuple):
+    """Relative paths changed between two DirSnapshot."""
+
+    added: list[str]
+    removed: list[str]
+    modified: list[str]
+
+
+@moduleexport
+class DirSnapshot:
+    """Index of a directory tree: relative path -> (size, mtime_ns, hash).
+
+    Stored as gzipped JSON. Taking a snapshot with a previous one only
+    hashes files whose size or mtime changed."""
+
+    __slots__: tuple[str, ...] = ("algorithm", "basepath", "entries")
+
+    def __init__(
+        self,
+        basepath: str,
+        entries: dict[str, tuple[int, int, str | None]],
+        algorithm: str | None = None,
+    ) -> None:
+        """Hold given entries, usually built by take or load."""
+        self.basepath: str = basepath
+        self.entries: dict[str, tuple[int, int, str | None]] = entries
+        self.algorithm: str | None = algorithm
+
+    @classmethod
+    def take(
+        cls,
+        basepath: str,
+        algorithm: str | None = None,
+        previous: DirSnapshot | None = None,
+        parallel: int | None = None,
+    ) -> DirSnapshot:
+        """Scan basepath, hash (if algorithm given) new and changed files.
+
+        Unreadable files are kept without hash, vanished ones are left out."""
+        entries: dict[str, tuple[int, int, str | None]] = {}
+        tohash: dict[str, str] = {}
+        for entry in scan_files(basepath, parallel=parallel):
+            relpath: str = os.path.relpath(entry.path, basepath)
+            known: tuple[int, int, str | None] | None = (
+                previous.entries.get(relpath)
+                if previous is not None and previous.algorithm == algorithm
+                else None
+            )
+            if known is not None and known[:2] == (entry.size, entry.mtime_ns):
+                entries[relpath] = known
+            else:
+                entries[relpath] = (entry.size, entry.mtime_ns, None)
+                if algorithm is not None:
+                    tohash[entry.path] = relpath
+        if algorithm is not None and tohash:
+            digests: dict[str, str] = hashfiles(
+                tohash, algorithm=algorithm, max_workers=parallel
+            )
+            for filename, relpath in tohash.items():
+                if filename in digests:
+                    entries[relpath] = (*entries[relpath][:2], digests[filename])
+                elif not os.path.lexists(filename):  # vanished while scanning
+                    del entries[relpath]
+        return cls(basepath, entries, algorithm)
+
+    def diff(self, previous: DirSnapshot) -> SnapshotDiff:
+        """Files added, removed and modified since previous.
+
+        With hashes on both sides touched files of same content are not
+        reported as modified."""
+        modified: list[str] = []
+        for relpath in self.entries.keys() & previous.entries.keys():
+            new: tuple[int, int, str | None] = self.entries[relpath]
+            old: tuple[int, int, str | None] = previous.entries[relpath]
+            if new[:2] != old[:2] and (
+                new[2] is None or old[2] is None or new[2] != old[2]
+            ):
+                modified.append(relpath)
+        return SnapshotDiff(
+            added=sorted(self.entries.keys() - previous.entries.keys()),
+            removed=sorted(previous.entries.keys() - self.entries.keys()),
+            modified=sorted(modified),
+        )
+
+    def save(self, filename: str) -> None:
+        """Write gzipped JSON atomically."""
+        atomic_write(
+            filename,
+            [
+                gzip.compress(
+                    json.dumps(
+                        {
+                            "basepath": self.basepath,
+                            "algorithm": self.algorithm,
+                            "entries": [
+                                [relpath, *values]
+                                for relpath, values in self.entries.items()
+                            ],
+                        },
+                        separators=(",", ":"),
+                    ).encode()
+                )
+            ],
+        )
+
+    @classmethod
+    def load(cls, filename: str) -> DirSnapshot:
+        """Read snapshot written by save."""
+        with gzip.open(filename, "rt", encoding="utf-8") as thefile:
+            content: dict[str, Any] = json.load(thefile)
+        return cls(
+            content["basepath"],
+            {
+                relpath: (size, mtime_ns, digest)
+                for relpath, size, mtime_ns, digest in content["entries"]
+            },
+            content["algorithm"],
+        )
+
+
+@moduleexport
+def update_snapshot(
+    basepath: str,
+    snapshotfile: str,
+    algorithm: str | None = None,
+    parallel: int | None = None,
+) -> SnapshotDiff:
+    """Compare basepath with snapshotfile (if existing) and save new snapshot."""
+    previous: DirSnapshot = (
+        DirSnapshot.load(snapshotfile)
+        if os.path.exists(snapshotfile)
+        else DirSnapshot(basepath, {}, algorithm)
+    )
+    current: DirSnapshot = DirSnapshot.take(basepath, algorithm, previous, parallel)
+    current.save(snapshotfile)
+    return current.diff(previous)
+
+
+def _duty_cycle(
+    theload: float, loadduration: float, period: float, core: int | None
+) -> float:
+    """Hold theload on core for loadduration seconds, return achieved load.
+
+    Busy and idle alternate per period, the busy share is corrected by the
+    CPU time really consumed so far (lost to preemption or sleep jitter)."""
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+    start: float = time.perf_counter()
+    cpustart: float = time.thread_time()
+    deadline: float = start + loadduration
+    periodend: float = start
+    busy: float = theload * period
+    while (now := time.perf_counter()) < deadline:
+        periodend += period
+        spinuntil: float = min(now + busy, deadline)
+        while time.perf_counter() < spinuntil:
+            pass
+        missing: float = theload * (time.perf_counter() - start) - (
+            time.thread_time() - cpustart
+        )
+        busy = min(period, max(0.0, theload * period + missing))
+        if (idle := min(periodend, deadline) - time.perf_counter()) > 0:
+            time.sleep(idle)
+    return (time.thread_time() - cpustart) / max(time.perf_counter() - start, 1e-9)
+
+
+@moduleexport
+def load_cores(
+    theload: float = 0.5,
+    loadduration: float = 10,
+    cores: Iterable[int] | None = None,
+    period: float = 0.1,
+) -> list[float]:
+    """Generate theload (0 to 1) per core, return achieved load per core.
+
+    One process per core (all usable ones if None), pinned where the OS
+    supports it, runs a calibrated duty cycle of period seconds."""
+    if not 0 <= theload <= 1:
+        raise ValueError(f"theload {theload} not within 0 and 1")
+    thecores: list[int] = sorted(
+        cores
+        if cores is not None
+        else (
+            os.sched_getaffinity(0)
+            if hasattr(os, "sched_getaffinity")
+            else range(os.cpu_count() or 1)
+        )
+    )
+    with concurrent.futures.ProcessPoolExecutor(len(thecores)) as pool:
+        return list(
+            pool.map(partial(_duty_cycle, theload, loadduration, period), thecores)
+        )
 
 
 try:
     cpu_load_generator: ModuleType = __import__(name="cpu_load_generator")
     # from cpu_load_generator import load_all_cores, load_single_core
 except ImportError:
-    pass
+
+    @moduleexport
+    def loadonecore(
+        loadduration: int = 10, loadedcore: int = 0, theload: float = 0.5
+    ) -> None:
+        """Generate load on one given core."""
+        load_cores(theload, loadduration, [loadedcore])
+
+    @moduleexport
+    def loadallcores(loadduration: int = 10, theload: float = 0.5) -> None:
+        """Just a helper function to generate load on all cores."""
+        load_cores(theload, loadduration)
+
 else:
 
     @moduleexport
@@ -362,50 +1372,702 @@ def stringtovalidfilename2(inputstring: str) -> str:
     )
 
 
-HowType = Literal["tpe", "ppe", "thread"]
+HowType = Literal["tpe", "ppe", "thread", "ipe", "auto"]
+StartMethodType = Literal["fork", "forkserver", "spawn"]
+ChunkSizeType = int | Literal["auto"]
+_executors: dict[
+    tuple[HowType, int | None, StartMethodType | None], concurrent.futures.Executor
+] = {}
+_executors_lock: threading.Lock = threading.Lock()
+
+
+@moduleexport
+def is_free_threaded() -> bool:
+    """Check if running on a free-threaded build with the GIL disabled."""
+    return not getattr(sys, "_is_gil_enabled", lambda: True)()
 
 
 @moduleexport
-async def run_grouped[_FunCallResultT](
-    the_functioncalls: list[Callable[[], _FunCallResultT]],
+def recommended_how() -> HowType:
+    """Best how for CPU-bound Python code in this interpreter.
+
+    "thread" without GIL, sub-interpreters ("ipe", Python 3.14+) where
+    available, else "ppe"."""
+    if is_free_threaded():
+        return "thread"
+    if hasattr(concurrent.futures, "InterpreterPoolExecutor"):
+        return "ipe"
+    return "ppe"
+
+
+def _resolvehow(how: str) -> HowType:
+    """Raise for unknown how, replace "auto" and unavailable "ipe"."""
+    if how not in ("thread", "tpe", "ppe", "ipe", "auto"):
+        raise ValueError(
+            f"how was {how!r} but needs to be one of "
+            "'thread', 'tpe', 'ppe', 'ipe' or 'auto'."
+        )
+    if how == "auto":
+        return recommended_how()
+    if how == "ipe" and not hasattr(concurrent.futures, "InterpreterPoolExecutor"):
+        thelogger.warning("InterpreterPoolExecutor not available, using 'ppe'.")
+        return "ppe"
+    if how == "ppe" and is_free_threaded():
+        thelogger.info("free-threaded build, 'thread' would avoid process costs.")
+    return cast(HowType, how)
+
+
+@moduleexport
+def get_executor(
+    how: HowType = "ppe",
+    max_workers: int | None = None,
+    start_method: StartMethodType | None = None,
+) -> concurrent.futures.Executor:
+    """Shared executor for how, created on first use and reused later.
+
+    start_method selects the multiprocessing context for "ppe"."""
+    how = _resolvehow(how)
+    key: tuple[HowType, int | None, StartMethodType | None] = (
+        how,
+        max_workers,
+        start_method,
+    )
+    with _executors_lock:
+        if key not in _executors:
+            match how:
+                case "ppe":
+                    _executors[key] = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=max_workers,
+                        mp_context=(
+                            None
+                            if start_method is None
+                            else multiprocessing.get_context(start_method)
+                        ),
+                    )
+                case "ipe":
+                    # getattr: not in the stubs of Python < 3.14
+                    _executors[key] = getattr(  # noqa: B009
+                        concurrent.futures, "InterpreterPoolExecutor"
+                    )(max_workers=max_workers)
+                case _:
+                    _executors[key] = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=max_workers
+                    )
+        return _executors[key]
+
+
+def _warmup_worker(_index: int) -> int:
+    """Import package in worker and report its process id."""
+    __import__(name="valuefragments")
+    time.sleep(0.01)  # keep worker busy, so each call needs its own
+    return os.getpid()
+
+
+@moduleexport
+def warmup_executor(
+    how: HowType = "ppe",
+    max_workers: int | None = None,
+    start_method: StartMethodType | None = None,
+) -> set[int]:
+    """Start all workers of the shared executor now, return their pids."""
+    executor: concurrent.futures.Executor = get_executor(how, max_workers, start_method)
+    return set(
+        executor.map(
+            _warmup_worker,
+            range(getattr(executor, "_max_workers", None) or os.cpu_count() or 1),
+        )
+    )
+
+
+@moduleexport
+def shutdown_executors(wait: bool = True) -> None:
+    """Shut down all shared executors of get_executor."""
+    with _executors_lock:
+        executors: list[concurrent.futures.Executor] = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+atexit.register(shutdown_executors)
+_terminated_executors: weakref.WeakSet[concurrent.futures.Executor] = weakref.WeakSet()
+
+
+def _terminate_executor(executor: concurrent.futures.Executor) -> None:
+    """Really stop a shared process pool with hanging tasks and drop it.
+
+    Pools not created by get_executor belong to the caller and are kept."""
+    if not isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        return  # threads cannot be stopped, they run on unobserved
+    with _executors_lock:
+        keys: list[tuple[HowType, int | None, StartMethodType | None]] = [
+            key for key, value in _executors.items() if value is executor
+        ]
+        if not keys:
+            return
+        for key in keys:
+            del _executors[key]
+    _terminated_executors.add(executor)
+    if hasattr(executor, "terminate_workers"):  # Python 3.14+
+        executor.terminate_workers()
+        return
+    # pylint: disable-next=protected-access
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _aiterate[T](
+    theitems: Iterable[T] | AsyncIterable[T],
+) -> AsyncGenerator[T, None]:
+    """Iterate sync or async iterable asynchronously."""
+    if isinstance(theitems, AsyncIterable):
+        async for theitem in theitems:
+            yield theitem
+    else:
+        for theitem in theitems:
+            yield theitem
+
+
+_CHUNK_TARGET_SECONDS: float = 0.05
+_CHUNK_MAXSIZE: int = 1024
+
+
+class _SharedRef(NamedTuple):
+    """Description of a result moved into shared memory by a worker."""
+
+    name: str
+    nbytes: int
+    format: str
+    shape: tuple[int, ...]
+    dtype: str | None
+
+
+def _shared_call(funcall: Callable[[], Any], threshold: int) -> Any:
+    """Run funcall in worker, move large buffer results to shared memory."""
+    result: Any = funcall()
+    try:  # numpy datetime64/timedelta64 arrays raise ValueError
+        view: memoryview = memoryview(result)
+    except (TypeError, ValueError, BufferError):
+        return result
+    if view.nbytes < threshold or "O" in view.format:
+        return result
+    dtype: Any = getattr(result, "dtype", None)
+    # only dtypes which dtype.str describes completely, no structured ones
+    if dtype is not None and (
+        getattr(dtype, "fields", None) is not None
+        or getattr(dtype, "kind", "") in ("O", "M", "m")
+    ):
+        return result
+    theformat: str = view.format
+    theshape: tuple[int, ...] = view.shape or ()
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes())
+    # untracked here, the parent registers when attaching and owns it
+    if sys.version_info >= (3, 13):
+        segment: shared_memory.SharedMemory = shared_memory.SharedMemory(
+            create=True, size=max(1, view.nbytes), track=False
+        )
+    else:
+        segment = shared_memory.SharedMemory(create=True, size=max(1, view.nbytes))
+        # pylint: disable-next=protected-access
+        resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore[attr-defined]
+    target: memoryview = cast(memoryview, segment.buf)
+    target[: view.nbytes] = view.cast("B")
+    segment.close()
+    return _SharedRef(
+        segment.name,
+        view.nbytes,
+        theformat,
+        theshape,
+        getattr(dtype, "str", None),
+    )
+
+
+def _discard_shared(result: Any) -> None:
+    """Unlink the segment of a _SharedRef nobody will attach to."""
+    if not isinstance(result, _SharedRef):
+        return
+    try:
+        segment: shared_memory.SharedMemory = shared_memory.SharedMemory(
+            name=result.name
+        )
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+def _discard_shared_chunk(
+    cfuture: concurrent.futures.Future[list[tuple[bool, Any, float]]],
+) -> None:
+    """Done callback for an abandoned chunk, unlink its shared results."""
+    if cfuture.cancelled() or cfuture.exception() is not None:
+        return
+    for _, result, _ in cfuture.result():
+        _discard_shared(result)
+
+
+@moduleexport
+class SharedResult:
+    """Large result of run_grouped("ppe", sharedmemory=...) in shared memory.
+
+    value is a zero-copy view (numpy array for numpy results, else a
+    memoryview). The parent owns the segment: call release() or use as
+    context manager when done, views must not be used afterwards."""
+
+    __slots__: tuple[str, str] = ("_segment", "value")
+
+    def __init__(self, ref: _SharedRef) -> None:
+        """Attach to segment described by ref."""
+        self._segment: shared_memory.SharedMemory | None = shared_memory.SharedMemory(
+            name=ref.name
+        )
+        segmentview: memoryview = cast(memoryview, self._segment.buf)
+        rawview: memoryview = segmentview[: ref.nbytes]
+        self.value: Any = rawview
+        if ref.dtype is not None:
+            try:
+                numpy: ModuleType = __import__(name="numpy")
+            except ImportError:
+                pass
+            else:
+                self.value = numpy.ndarray(ref.shape, dtype=ref.dtype, buffer=rawview)
+                return
+        try:
+            self.value = rawview.cast(ref.format, ref.shape)  # type: ignore[call-overload]
+        except (TypeError, ValueError):
+            thelogger.debug("format %s kept as bytes view", ref.format)
+
+    def release(self) -> None:
+        """Free the shared memory segment."""
+        if self._segment is None:
+            return
+        self.value = None
+        try:
+            self._segment.close()
+        except BufferError:
+            thelogger.warning("views of %s still in use", self._segment.name)
+        self._segment.unlink()
+        self._segment = None
+
+    def __del__(self) -> None:
+        """Release if forgotten, before the segment is closed with views."""
+        self.release()
+
+    def __enter__(self) -> Self:
+        """Use as context manager."""
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        """Release on exit."""
+        self.release()
+
+
+def _run_chunk[_FunCallResultT](
+    funcalls: list[Callable[[], _FunCallResultT]],
+    retries: int = 0,
+    backoff: float = 0.1,
+) -> list[tuple[bool, _FunCallResultT | Exception, float]]:
+    """Run calls one after another with retries on exceptions.
+
+    Return (success, result or exception, duration in seconds) per call."""
+    results: list[tuple[bool, _FunCallResultT | Exception, float]] = []
+    for funcall in funcalls:
+        before: float = time.perf_counter()
+        for attempt in range(retries + 1):
+            try:
+                results.append((True, funcall(), time.perf_counter() - before))
+                break
+            except Exception as theerr:  # pylint: disable=broad-exception-caught
+                if attempt == retries:
+                    results.append((False, theerr, time.perf_counter() - before))
+                else:
+                    time.sleep(backoff * 2**attempt)
+    return results
+
+
+class _ChunkSizer:  # pylint: disable=too-few-public-methods
+    """Fixed chunksize or adapted to measured durations ("auto")."""
+
+    __slots__: tuple[str, ...] = ("adaptive", "pertask", "size")
+
+    def __init__(self, chunksize: ChunkSizeType) -> None:
+        """Start with given size, or 1 if adaptive."""
+        self.adaptive: bool = chunksize == "auto"
+        self.size: int = 1 if chunksize == "auto" else max(1, chunksize)
+        self.pertask: float | None = None
+
+    def update(self, durations: list[float]) -> None:
+        """Adapt size so that one chunk takes about _CHUNK_TARGET_SECONDS."""
+        if not self.adaptive or not durations:
+            return
+        mean: float = sum(durations) / len(durations)
+        self.pertask = mean if self.pertask is None else (self.pertask + mean) / 2
+        self.size = max(
+            1,
+            min(_CHUNK_MAXSIZE, int(_CHUNK_TARGET_SECONDS / max(self.pertask, 1e-9))),
+        )
+
+
+CostsType = (
+    Sequence[float] | Callable[[Callable[[], Any]], float | None] | Literal["learned"]
+)
+_learned_costs: dict[str, float] = {}
+_learned_costs_lock: threading.Lock = threading.Lock()
+
+
+def _cost_key(funcall: Callable[..., Any]) -> str:
+    """Qualified name of the function behind (nested) partials."""
+    while isinstance(funcall, partial):
+        funcall = funcall.func
+    return (
+        f"{getattr(funcall, '__module__', None) or type(funcall).__module__}."
+        f"{getattr(funcall, '__qualname__', None) or type(funcall).__qualname__}"
+    )
+
+
+def _learn_costs(keyed_durations: Iterable[tuple[str, float]]) -> None:
+    """Move learned costs halfway towards the measured durations."""
+    with _learned_costs_lock:
+        for key, duration in keyed_durations:
+            previous: float | None = _learned_costs.get(key)
+            _learned_costs[key] = (
+                duration if previous is None else (previous + duration) / 2
+            )
+
+
+@moduleexport
+def learned_costs() -> dict[str, float]:
+    """Copy of the durations in seconds run_grouped learned per function."""
+    with _learned_costs_lock:
+        return dict(_learned_costs)
+
+
+def _estimate_costs(
+    funcalls: Sequence[Callable[[], Any]], costs: CostsType
+) -> list[float]:
+    """Cost per funcall: given, else learned, else mean of the known ones."""
+    if not (callable(costs) or isinstance(costs, str)):
+        if len(costs) != len(funcalls):
+            raise ValueError(f"{len(costs)} costs for {len(funcalls)} calls")
+        return [float(cost) for cost in costs]
+    # callbacks outside the lock, they may ask learned_costs() themselves
+    estimates: list[float | None] = [
+        (None if isinstance(costs, str) else costs(funcall)) for funcall in funcalls
+    ]
+    with _learned_costs_lock:
+        estimates = [
+            _learned_costs.get(_cost_key(funcall)) if estimate is None else estimate
+            for funcall, estimate in zip(funcalls, estimates, strict=True)
+        ]
+    known: list[float] = [estimate for estimate in estimates if estimate is not None]
+    default: float = sum(known) / len(known) if known else 0.0
+    return [default if estimate is None else estimate for estimate in estimates]
+
+
+async def _scheduled[_FunCallResultT](
+    the_functioncalls: (
+        Iterable[Callable[[], _FunCallResultT]]
+        | AsyncIterable[Callable[[], _FunCallResultT]]
+    ),
+    costs: CostsType | None,
+) -> AsyncGenerator[tuple[int, Callable[[], _FunCallResultT], float], None]:
+    """Yield (index, funcall, estimated cost), longest first if costs given."""
+    if costs is None:
+        index: int = 0
+        async for funcall in _aiterate(the_functioncalls):
+            yield index, funcall, 0.0
+            index += 1
+        return
+    funcalls: list[Callable[[], _FunCallResultT]] = [
+        funcall async for funcall in _aiterate(the_functioncalls)
+    ]
+    estimates: list[float] = _estimate_costs(funcalls, costs)
+    for index in sorted(range(len(funcalls)), key=estimates.__getitem__, reverse=True):
+        yield index, funcalls[index], estimates[index]
+
+
+async def _await_chunk[_FunCallResultT](
+    chunkcall: Callable[[], list[tuple[bool, _FunCallResultT | Exception, float]]],
+    executor: concurrent.futures.Executor | None,
+    timeout: float | None,
+) -> list[tuple[bool, _FunCallResultT | Exception, float]]:
+    """Await chunkcall in executor (or a thread) for at most timeout seconds.
+
+    Shared memory results of an abandoned (timed out or cancelled) chunk
+    are unlinked as soon as it finishes anyway."""
+    if executor is None:
+        return await asyncio.wait_for(asyncio.to_thread(chunkcall), timeout)
+    cfuture: concurrent.futures.Future[
+        list[tuple[bool, _FunCallResultT | Exception, float]]
+    ] = executor.submit(chunkcall)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(cfuture), timeout)
+    except (TimeoutError, asyncio.CancelledError):
+        cfuture.add_done_callback(_discard_shared_chunk)
+        raise
+
+
+async def _submit_chunk[_FunCallResultT](  # pylint: disable=too-many-arguments
+    funcalls: list[Callable[[], _FunCallResultT]],
+    getexecutor: Callable[[], concurrent.futures.Executor | None],
+    timeout: float | None,
+    retries: int,
+    backoff: float,
+    resubmit: bool = True,
+    slots: asyncio.Semaphore | None = None,
+) -> list[tuple[bool, _FunCallResultT | Exception, float]]:
+    """Run chunk by executor (or to_thread if None).
+
+    The chunk may take timeout seconds per call, a timed out shared process
+    pool is terminated and the chunk resubmitted while retries are left.
+    Without resubmit (executor given by the caller) a timed out chunk
+    fails at once, a new attempt would only queue behind the hanging one.
+    With slots (one per worker) the chunk is only submitted when a worker
+    is free, so the timeout does not count time spent in the queue."""
+    chunkcall: Callable[[], list[tuple[bool, _FunCallResultT | Exception, float]]] = (
+        partial(_run_chunk, funcalls, retries, backoff)
+    )
+    attempt: int = 0
+    while True:
+        async with slots or nullcontext():
+            executor: concurrent.futures.Executor | None = getexecutor()
+            try:
+                return await _await_chunk(
+                    chunkcall,
+                    executor,
+                    None if timeout is None else timeout * len(funcalls),
+                )
+            except TimeoutError:
+                if executor is not None:
+                    _terminate_executor(executor)
+                if attempt >= retries or not resubmit:
+                    timeouterr: TimeoutError = TimeoutError(
+                        f"chunk of {len(funcalls)} calls exceeded {timeout} s per call"
+                    )
+                    return [(False, timeouterr, timeout or 0.0)] * len(funcalls)
+            except concurrent.futures.BrokenExecutor as brokenerr:
+                # terminated for a timeout of another chunk: resubmit for free
+                if executor in _terminated_executors and getexecutor() is not executor:
+                    continue
+                return [(False, brokenerr, 0.0)] * len(funcalls)
+        await asyncio.sleep(backoff * 2**attempt)
+        attempt += 1
+
+
+@moduleexport
+async def run_grouped_as_completed[_FunCallResultT](  # noqa: C901
+    the_functioncalls: (
+        Iterable[Callable[[], _FunCallResultT]]
+        | AsyncIterable[Callable[[], _FunCallResultT]]
+    ),
     how: HowType = "thread",
-) -> list[_FunCallResultT]:
-    """Execute funcalls async by given method."""
-    match how:
-        case "thread":
-            async with asyncio.TaskGroup() as the_task_group:
-                all_tasks: list[asyncio.Task[_FunCallResultT]] = [
-                    the_task_group.create_task(asyncio.to_thread(funcall))
-                    for funcall in the_functioncalls
-                ]
-            return [ready_task.result() for ready_task in all_tasks]
-        case "ppe":
-            with concurrent.futures.ProcessPoolExecutor() as executor:
-                async with asyncio.TaskGroup() as the_task_group:
-                    all_tasks = [
-                        the_task_group.create_task(to_inner_task(funcall, executor))
-                        for funcall in the_functioncalls
-                    ]
-            return [ready_task.result() for ready_task in all_tasks]
-        case "tpe":
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                async with asyncio.TaskGroup() as the_task_group:
-                    all_tasks = [
-                        the_task_group.create_task(to_inner_task(funcall, executor))
-                        for funcall in the_functioncalls
-                    ]
-            return [ready_task.result() for ready_task in all_tasks]
-        case _:  # pyright: ignore[reportUnnecessaryComparison]
-            print(
-                "how was '",
-                how,
-                "' but needs to be one of {'thread','tpe','ppe'}.",
+    *,
+    max_concurrency: int | None = None,
+    executor: concurrent.futures.Executor | None = None,
+    chunksize: ChunkSizeType = 1,
+    timeout: float | None = None,
+    retries: int = 0,
+    backoff: float = 0.1,
+    return_exceptions: bool = False,
+    sharedmemory: int | None = None,
+    costs: CostsType | None = None,
+) -> AsyncGenerator[tuple[int, _FunCallResultT], None]:
+    """Execute funcalls async by given method, yield (index, result) when ready.
+
+    With max_concurrency at most that many submissions are pending and the
+    input is only read further when one of them is done (backpressure).
+    "tpe" and "ppe" use the shared executor of get_executor unless an
+    executor is given.
+    chunksize calls are shipped together to a worker, which amortizes the
+    pickling for small tasks with "ppe". With "auto" the size follows the
+    measured durations (about 50 ms per chunk); if no max_concurrency is
+    given, it is set to twice the number of workers then.
+    Failing calls are retried up to retries times, waiting backoff * 2**n
+    seconds before. Calls exceeding timeout seconds fail with TimeoutError,
+    for "ppe" the workers are terminated (threads can not be stopped).
+    With a timeout no more chunks are submitted than the executor has
+    workers, so waiting in its queue does not count.
+    A given executor is only terminated if it came from get_executor, its
+    timed out calls are not retried.
+    With return_exceptions the exception is delivered instead of a result,
+    otherwise the first one is raised and all other calls are cancelled.
+    "ipe" runs in sub-interpreters (Python 3.14+, else "ppe") and "auto"
+    takes recommended_how().
+    With sharedmemory (a size in bytes) "ppe" results supporting the buffer
+    protocol (bytes, numpy arrays, ...) of at least that size come back
+    as SharedResult instead of being pickled (POSIX only).
+    With costs (estimated seconds per call as sequence or function of the
+    call, or "learned") the input is read completely and started longest
+    first, idle workers take the next queued call. Unknown costs are the
+    durations learned per function by earlier runs (see learned_costs),
+    else the mean. Chunks of "auto" size then hold about 50 ms of work."""
+    how = _resolvehow(how)
+    shmthreshold: int | None = (
+        sharedmemory if how == "ppe" and os.name == "posix" else None
+    )
+
+    def getexecutor() -> concurrent.futures.Executor | None:
+        """Given executor or the (maybe renewed) shared one."""
+        if executor is not None or how == "thread":
+            return executor
+        return get_executor(how)
+
+    sizer: _ChunkSizer = _ChunkSizer(chunksize)
+    if sizer.adaptive and max_concurrency is None:
+        max_concurrency = 2 * (
+            getattr(getexecutor(), "_max_workers", None) or os.cpu_count() or 1
+        )
+
+    # with a timeout chunks must not wait in the queue of the executor
+    slots: asyncio.Semaphore | None = (
+        None
+        if timeout is None
+        else asyncio.Semaphore(
+            getattr(getexecutor(), "_max_workers", None)
+            or min(32, (os.cpu_count() or 1) + 4)
+        )
+    )
+    pending: dict[
+        asyncio.Task[list[tuple[bool, _FunCallResultT | Exception, float]]],
+        tuple[list[int], list[str]],
+    ] = {}
+
+    async def harvest() -> list[tuple[int, _FunCallResultT]]:
+        """Wait for a pending chunk, return results with indices."""
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        chunks: list[
+            tuple[list[int], list[tuple[bool, _FunCallResultT | Exception, float]]]
+        ] = []
+        for ready_task in done:
+            indices, keys = pending.pop(ready_task)
+            timedresults = ready_task.result()
+            sizer.update([duration for _, _, duration in timedresults])
+            _learn_costs(
+                (key, duration)
+                for key, (success, _, duration) in zip(keys, timedresults, strict=True)
+                if success
             )
-            raise NotImplementedError(
-                "how was '",
-                how,
-                "' but needs to be one of {'thread','tpe','ppe'}.",
+            chunks.append((indices, timedresults))
+        if not return_exceptions:
+            for _, timedresults in chunks:
+                for success, result, _ in timedresults:
+                    if not success:
+                        # nobody will attach to shared results of these chunks
+                        for _, othertimedresults in chunks:
+                            for _, other, _ in othertimedresults:
+                                _discard_shared(other)
+                        raise cast(Exception, result)
+        return [
+            (
+                index,
+                cast(
+                    _FunCallResultT,
+                    SharedResult(result) if isinstance(result, _SharedRef) else result,
+                ),
+            )
+            for indices, timedresults in chunks
+            for index, (_, result, _) in zip(indices, timedresults, strict=True)
+        ]
+
+    def submit(
+        indices: list[int],
+        keys: list[str],
+        chunk: list[Callable[[], _FunCallResultT]],
+    ) -> None:
+        """Add task for chunk to pending."""
+        pending[
+            asyncio.ensure_future(
+                _submit_chunk(
+                    chunk,
+                    getexecutor,
+                    timeout,
+                    retries,
+                    backoff,
+                    executor is None,
+                    slots,
+                )
             )
+        ] = (indices, keys)
+
+    bycost: bool = sizer.adaptive and costs is not None
+    try:
+        indices: list[int] = []
+        keys: list[str] = []
+        chunk: list[Callable[[], _FunCallResultT]] = []
+        chunkcost: float = 0.0
+        async for index, funcall, cost in _scheduled(the_functioncalls, costs):
+            indices.append(index)
+            keys.append(_cost_key(funcall))
+            chunk.append(
+                funcall
+                if shmthreshold is None
+                else partial(_shared_call, funcall, shmthreshold)
+            )
+            chunkcost += cost
+            if bycost and cost > 0:
+                if chunkcost < _CHUNK_TARGET_SECONDS and len(chunk) < _CHUNK_MAXSIZE:
+                    continue
+            elif len(chunk) < sizer.size:
+                continue
+            submit(indices, keys, chunk)
+            indices, keys, chunk, chunkcost = [], [], [], 0.0
+            if max_concurrency is not None and len(pending) >= max_concurrency:
+                for item in await harvest():
+                    yield item
+        if chunk:
+            submit(indices, keys, chunk)
+        while pending:
+            for item in await harvest():
+                yield item
+    finally:  # on error or early stop of consumer
+        for open_task in pending:
+            open_task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for open_task in pending:  # finished before it could be cancelled
+            if not open_task.cancelled() and open_task.exception() is None:
+                for _, result, _ in open_task.result():
+                    _discard_shared(result)
+
+
+@moduleexport
+async def run_grouped[_FunCallResultT](  # pylint: disable=too-many-arguments
+    the_functioncalls: (
+        Iterable[Callable[[], _FunCallResultT]]
+        | AsyncIterable[Callable[[], _FunCallResultT]]
+    ),
+    how: HowType = "thread",
+    *,
+    max_concurrency: int | None = None,
+    executor: concurrent.futures.Executor | None = None,
+    chunksize: ChunkSizeType = 1,
+    timeout: float | None = None,
+    retries: int = 0,
+    backoff: float = 0.1,
+    return_exceptions: bool = False,
+    sharedmemory: int | None = None,
+    costs: CostsType | None = None,
+) -> list[_FunCallResultT]:
+    """Execute funcalls async by given method, results in input order.
+
+    Parameters as for run_grouped_as_completed."""
+    results: dict[int, _FunCallResultT] = {}
+    async for index, result in run_grouped_as_completed(
+        the_functioncalls,
+        how,
+        max_concurrency=max_concurrency,
+        executor=executor,
+        chunksize=chunksize,
+        timeout=timeout,
+        retries=retries,
+        backoff=backoff,
+        return_exceptions=return_exceptions,
+        sharedmemory=sharedmemory,
+        costs=costs,
+    ):
+        results[index] = result
+    return [results[index] for index in range(len(results))]
 
 
 @moduleexport
@@ -413,11 +2075,26 @@ def getselectedhreflinks(
     thebaseurl: str = "https://goc-stuttgart.de/event-guide/ergebnisarchiv",
     thesubstring: str = "fileadmin/ergebnisse/2024",
     thetimeout: int | tuple[int, int] = (5, 10),
+    thesession: requests.Session | None = None,
+    maxlinks: int | None = None,
 ) -> list[str]:
-    """Parse HTML from URL for anachor-tag href matches by XPATH"""
+    """Parse HTML from URL for anachor-tag href matches by XPATH
+
+    With maxlinks the page is parsed while streaming and the download
+    stops after that many matches (see iterselectedhreflinks)."""
     # <https://devhints.io/xpath> <https://stackoverflow.com/q/78877951>
+    if maxlinks is not None:
+        return list(
+            iterselectedhreflinks(
+                thebaseurl,
+                thesubstring,
+                thetimeout,
+                thesession=thesession,
+                maxlinks=maxlinks,
+            )
+        )
     try:
-        thesourcehtml: requests.Response = requests.get(
+        thesourcehtml: requests.Response = (thesession or requests).get(
             url=thebaseurl, timeout=thetimeout
         )
     except requests.exceptions.Timeout:
@@ -430,6 +2107,7 @@ def getselectedhreflinks(
         thesourcehtml.status_code,
         thesourcehtml.reason,
     )
+    fromstring = __import__(name="lxml.html", fromlist=["fromstring"]).fromstring
     return reveal_type(
         fromstring(html=thesourcehtml.content).xpath(
             f'//a/@href[contains(string(), "{thesubstring}")]'
@@ -437,6 +2115,122 @@ def getselectedhreflinks(
     )
 
 
+@moduleexport
+def iterselectedhreflinks(  # pylint: disable=too-many-arguments
+    thebaseurl: str = "https://goc-stuttgart.de/event-guide/ergebnisarchiv",
+    thesubstring: str = "fileadmin/ergebnisse/2024",
+    thetimeout: int | tuple[int, int] = (5, 10),
+    *,
+    thesession: requests.Session | None = None,
+    maxlinks: int | None = None,
+    chunklen: int = 2**14,
+) -> Generator[str, None, None]:
+    """Yield anchor-tag hrefs containing thesubstring while downloading.
+
+    Chunks are fed to an lxml HTMLPullParser and parsed elements are
+    dropped, so memory stays small for large pages. Stops after maxlinks
+    matches."""
+    if maxlinks is not None and maxlinks <= 0:
+        return
+    try:
+        thesourcehtml: requests.Response = (thesession or requests).get(
+            url=thebaseurl, timeout=thetimeout, stream=True
+        )
+    except requests.exceptions.Timeout:
+        thelogger.error("timeout exception while fetching %s", thebaseurl)
+        return
+    thelogger.debug(
+        "Request to %s with Status %i and Reason %s",
+        thebaseurl,
+        thesourcehtml.status_code,
+        thesourcehtml.reason,
+    )
+    parser: Any = __import__(
+        name="lxml.etree", fromlist=["HTMLPullParser"]
+    ).HTMLPullParser(events=("end",))
+
+    def matches() -> Iterator[str]:
+        """Matching hrefs of the parsed elements, which are dropped then."""
+        for _, element in parser.read_events():
+            href: str | None = element.get("href") if element.tag == "a" else None
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            if href is not None and thesubstring in href:
+                yield href
+
+    def streamed() -> Iterator[str]:
+        """Feed the response chunkwise to the parser."""
+        for chunk in thesourcehtml.iter_content(chunklen):
+            parser.feed(chunk)
+            yield from matches()
+        parser.close()
+        yield from matches()
+
+    with thesourcehtml:
+        try:
+            yield from itertools.islice(streamed(), maxlinks)
+        except requests.exceptions.Timeout:
+            thelogger.error("timeout exception while reading %s", thebaseurl)
+
+
+@moduleexport
+def pooled_session(maxperhost: int = 4) -> requests.Session:
+    """Session keeping up to maxperhost connections per host for reuse.
+
+    Further requests to a host wait for a free connection (pool_block)."""
+    thesession: requests.Session = requests.Session()
+    theadapter: requests.adapters.HTTPAdapter = requests.adapters.HTTPAdapter(
+        pool_maxsize=maxperhost, pool_block=True
+    )
+    thesession.mount("http://", theadapter)
+    thesession.mount("https://", theadapter)
+    return thesession
+
+
+@moduleexport
+def getselectedhreflinks_batch(  # pylint: disable=too-many-arguments
+    theurls: Iterable[str],
+    thesubstring: str = "fileadmin/ergebnisse/2024",
+    thetimeout: int | tuple[int, int] = (5, 10),
+    *,
+    max_workers: int = 8,
+    maxperhost: int = 4,
+    thesession: requests.Session | None = None,
+) -> dict[str, list[str]]:
+    """Fetch URLs concurrently on one pooled session, map each to its links.
+
+    At most maxperhost requests run per host at a time. URLs failing with
+    a request exception map to an empty list like timeouts do."""
+    session: requests.Session = thesession or pooled_session(maxperhost)
+    hostlimits: dict[str, threading.BoundedSemaphore] = {}
+    hostlimits_lock: threading.Lock = threading.Lock()
+
+    def fetch(theurl: str) -> list[str]:
+        """Links of one URL within the limit of its host."""
+        host: str = urllib.parse.urlsplit(theurl).netloc
+        with hostlimits_lock:
+            hostlimit: threading.BoundedSemaphore = hostlimits.setdefault(
+                host, threading.BoundedSemaphore(maxperhost)
+            )
+        with hostlimit:
+            try:
+                return getselectedhreflinks(
+                    theurl, thesubstring, thetimeout, thesession=session
+                )
+            except requests.exceptions.RequestException as theerr:
+                thelogger.error("%s while fetching %s", theerr, theurl)
+                return []
+
+    uniqueurls: list[str] = list(dict.fromkeys(theurls))
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+            return dict(zip(uniqueurls, pool.map(fetch, uniqueurls), strict=True))
+    finally:
+        if thesession is None:
+            session.close()
+
+
 def print_time_result(wall: float, user: float, system: float) -> None:
     """Print Time Result."""
     print(
@@ -2,12 +2,27 @@
 
 from __future__ import annotations
 
+import builtins
+from collections import Counter
 from fractions import Fraction
+from functools import cache
+from itertools import accumulate
 from logging import Logger, getLogger
-from math import log
+from math import erf, exp, floor, gcd, log, pi, sqrt
+from types import ModuleType
+from typing import overload
 
 from .moduletools import moduleexport
-from .valuetyping import TYPE_CHECKING, Callable, SupportsFloat, TypeVar
+from .valuetyping import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Literal,
+    Sequence,
+    SupportsFloat,
+    TypeVar,
+)
 
 thelogger: Logger = getLogger(__name__)
 if not TYPE_CHECKING:
@@ -169,6 +184,448 @@ def easybisect(  # pylint: disable=too-many-arguments
     return data[-1]
 
 
+# items from which the "auto" method of needs_pmf uses FFT divide-and-conquer
+_FFT_MINITEMS: int = 256
+# below this many states a divide-and-conquer part is computed directly
+_FFT_MINSTATES: int = 1024
+
+# cases times need levels from which probneeds_estimate approximates
+_APPROX_MINWORK: int = 10**9
+# tolerated rounding drift of NeedsDistribution before it is rebuilt
+_DRIFT: float = 1e-9
+
+PmfMethod = Literal["auto", "direct", "fft"]
+EstimateMethod = Literal["auto", "exact", "approx"]
+
+
+@cache
+def _numpy() -> ModuleType | None:
+    """numpy if available, imported on first use."""
+    try:
+        return __import__(name="numpy")
+    except ImportError:
+        thelogger.info("No numpy here, probneeds uses lists")
+        return None
+
+
+def _checkneeds(probs: Sequence[float], needs: Sequence[int]) -> None:
+    """Raise ValueError for mismatching lengths or negative needs."""
+    if len(needs) != len(probs):
+        raise ValueError("needs and probs must have the same length")
+    if any(need < 0 for need in needs):
+        raise ValueError("needs must not be negative")
+
+
+def _add_case(pmf: Any, top: int, need: int, prob: float) -> None:
+    """Apply one case in place to pmf[: top + 1], which grows by need.
+
+    pmf (list or array) must be long enough already."""
+    if isinstance(pmf, list):
+        for count in range(top, -1, -1):
+            pmf[count + need] += pmf[count] * prob
+            pmf[count] *= 1 - prob
+    else:
+        shifted: Any = pmf[: top + 1] * prob
+        pmf[: top + 1] *= 1 - prob
+        pmf[need : top + need + 1] += shifted
+
+
+def _remove_case(pmf: Any, need: int, prob: float) -> Any:
+    """Undo _add_case by deconvolution, the result is need shorter.
+
+    Solved upwards if 1 - prob >= prob, else downwards, so that errors
+    are damped by min(prob, 1 - prob) / max(prob, 1 - prob) per step."""
+    size: int = len(pmf) - need
+    upwards: bool = 1 - prob >= prob
+    if isinstance(pmf, list):
+        old: Any = [0.0] * (size + need)  # zeros above for downwards
+        if upwards:
+            for count in range(size):
+                below: float = old[count - need] if count >= need else 0.0
+                old[count] = (pmf[count] - prob * below) / (1 - prob)
+        else:
+            for count in range(size - 1, -1, -1):
+                old[count] = (pmf[count + need] - (1 - prob) * old[count + need]) / prob
+        return old[:size]
+    numpy: Any = _numpy()
+    old = numpy.zeros(size + need)
+    # blocks of need entries depend only on the block before (after)
+    if upwards:
+        for start in range(0, size, need):
+            stop: int = min(start + need, size)
+            old[start:stop] = pmf[start:stop]
+            if start:
+                old[start:stop] -= prob * old[start - need : stop - need]
+            old[start:stop] /= 1 - prob
+    else:
+        for stop in range(size, 0, -need):
+            start = max(stop - need, 0)
+            old[start:stop] = (
+                pmf[start + need : stop + need]
+                - (1 - prob) * old[start + need : stop + need]
+            ) / prob
+    return old[:size]
+
+
+def _pmf_direct(probs: Sequence[float], needs: Sequence[int]) -> Any:
+    """Dense distribution of the overall need, one shifted weighted add per item.
+
+    A numpy array if available, else a list."""
+    numpy: ModuleType | None = _numpy()
+    pmf: Any = (
+        [0.0] * (sum(needs) + 1) if numpy is None else numpy.zeros(sum(needs) + 1)
+    )
+    pmf[0] = 1.0
+    top: int = 0  # highest reachable need so far
+    for need, prob in zip(needs, probs, strict=True):
+        if need:
+            _add_case(pmf, top, need, prob)
+            top += need
+    return pmf
+
+
+def _pmf_fft(probs: Sequence[float], needs: Sequence[int]) -> Any:
+    """Dense distribution of the overall need by divide-and-conquer.
+
+    Halves are combined by FFT convolution (numpy required), small parts
+    directly. Rounding noise below zero is clipped."""
+    numpy: Any = _numpy()
+    if len(needs) <= 1 or sum(needs) < _FFT_MINSTATES:
+        return _pmf_direct(probs, needs)
+    half: int = len(needs) // 2
+    first: Any = _pmf_fft(probs[:half], needs[:half])
+    second: Any = _pmf_fft(probs[half:], needs[half:])
+    size: int = len(first) + len(second) - 1
+    if min(len(first), len(second)) < 64:
+        return numpy.convolve(first, second)
+    return numpy.clip(
+        numpy.fft.irfft(
+            numpy.fft.rfft(first, size) * numpy.fft.rfft(second, size), size
+        ),
+        0,
+        None,
+    )
+
+
+def _pmf(probs: Sequence[float], needs: Sequence[int], method: PmfMethod) -> Any:
+    """Distribution of the overall need by method, array or list."""
+    _checkneeds(probs, needs)
+    if method == "auto":
+        method = (
+            "fft" if len(needs) >= _FFT_MINITEMS and _numpy() is not None else "direct"
+        )
+    if method == "fft":
+        if _numpy() is None:
+            raise ImportError("method fft needs numpy")
+        return _pmf_fft(probs, needs)
+    return _pmf_direct(probs, needs)
+
+
+def _sufficiency(pmf: Any, avails: float) -> float:
+    """Probability of an overall need of at most avails."""
+    if avails < 0:
+        return 0.0
+    part: Any = pmf[: floor(avails) + 1]
+    return float(sum(part) if isinstance(part, list) else part.sum())
+
+
+@moduleexport
+def needs_pmf(
+    probs: Sequence[float],
+    needs: Sequence[int],
+    method: PmfMethod = "auto",
+) -> list[float]:
+    """Probability of each overall need 0..sum(needs) for bernoulli cases.
+
+    "direct" applies every case as shifted weighted add to a dense array
+    (numpy if available), "fft" combines halves by FFT convolution, which
+    is faster for thousands of cases but only accurate to about 1e-15
+    absolute. "auto" takes "fft" from _FFT_MINITEMS cases on."""
+    pmf: Any = _pmf(probs, needs, method)
+    return pmf if isinstance(pmf, list) else pmf.tolist()
+
+
+def _cdf(pmf: Any) -> Any:
+    """Cumulative sums of pmf (along the last axis for arrays)."""
+    if isinstance(pmf, list):
+        return list(accumulate(pmf))
+    return pmf.cumsum(axis=-1)
+
+
+def _levels(cdf: Sequence[float], avails: Iterable[float] | None) -> list[float]:
+    """Sufficiency per stock level from cdf, every level if avails is None."""
+    if avails is None:
+        return [float(prob) for prob in cdf]
+    return [
+        0.0 if level < 0 else float(cdf[min(floor(level), len(cdf) - 1)])
+        for level in avails
+    ]
+
+
+@moduleexport
+def probneeds_levels(
+    probs: Sequence[float],
+    needs: Sequence[int],
+    avails: Iterable[float] | None = None,
+    method: PmfMethod = "auto",
+) -> list[float]:
+    """Sufficiency probability for each of the given stock levels.
+
+    The distribution is built once, every level is a lookup in its
+    cumulative sums. Without avails all levels 0..sum(needs) are given."""
+    return _levels(_cdf(_pmf(probs, needs, method)), avails)
+
+
+@moduleexport
+def probneeds_scenarios(
+    probrows: Sequence[Sequence[float]],
+    needs: Sequence[int],
+    avails: Iterable[float] | None = None,
+) -> list[list[float]]:
+    """probneeds_levels for many probability scenarios (rows) at once.
+
+    With numpy all scenarios go through the dense engine together as
+    rows of one 2-D array."""
+    levels: list[float] | None = None if avails is None else list(avails)
+    numpy: ModuleType | None = _numpy()
+    if numpy is None or not probrows:
+        return [probneeds_levels(probs, needs, levels, "direct") for probs in probrows]
+    for probs in probrows:
+        _checkneeds(probs, needs)
+    probmatrix: Any = numpy.asarray(probrows, dtype=numpy.float64)
+    pmf: Any = numpy.zeros((len(probrows), sum(needs) + 1))
+    pmf[:, 0] = 1.0
+    top: int = 0
+    for column, need in enumerate(needs):
+        if need == 0:
+            continue
+        prob: Any = probmatrix[:, column : column + 1]
+        shifted: Any = pmf[:, : top + 1] * prob
+        pmf[:, : top + 1] *= 1 - prob
+        pmf[:, need : top + need + 1] += shifted
+        top += need
+    return [_levels(cdf, levels) for cdf in _cdf(pmf)]
+
+
+def _quantiles(pmf: Any, targets: list[float]) -> list[int]:
+    """Smallest levels where the cumulated pmf reaches the targets."""
+    if any(not 0 <= target <= 1 for target in targets):
+        raise ValueError("targets must be within 0 and 1")
+    top: int = len(pmf) - 1
+    if not isinstance(pmf, list):
+        return [
+            min(int(level), top)
+            for level in pmf.cumsum().searchsorted(targets, side="left")
+        ]
+    levels: dict[float, int] = {}
+    pending: list[float] = sorted(set(targets), reverse=True)
+    for level, cumulated in enumerate(accumulate(pmf)):
+        while pending and cumulated >= pending[-1]:
+            levels[pending.pop()] = level
+        if not pending:
+            break
+    return [levels.get(target, top) for target in targets]
+
+
+@overload
+def probneeds_quantile(
+    probs: Sequence[float],
+    needs: Sequence[int],
+    targets: float,
+    method: PmfMethod = "auto",
+) -> int: ...
+
+
+@overload
+def probneeds_quantile(
+    probs: Sequence[float],
+    needs: Sequence[int],
+    targets: Iterable[float],
+    method: PmfMethod = "auto",
+) -> list[int]: ...
+
+
+@moduleexport
+def probneeds_quantile(
+    probs: Sequence[float],
+    needs: Sequence[int],
+    targets: float | Iterable[float],
+    method: PmfMethod = "auto",
+) -> int | list[int]:
+    """Smallest stock level sufficient with at least the target probability.
+
+    Several targets (service levels like 0.95 and 0.99) are answered from
+    one distribution, the scan stops at the level of the largest one.
+    Rounding may keep the overall sum just below 1, so sum(needs) is
+    sufficient for every target."""
+    thetargets: list[float] = (
+        [float(targets)]
+        if isinstance(targets, builtins.int | builtins.float)
+        else list(targets)
+    )
+    result: list[int] = _quantiles(_pmf(probs, needs, method), thetargets)
+    thelogger.debug("stock levels %s for targets %s", result, thetargets)
+    return result[0] if isinstance(targets, builtins.int | builtins.float) else result
+
+
+@moduleexport
+class NeedsDistribution:
+    """Distribution of the overall need for cases added and removed singly.
+
+    Both take O(states): add is the shifted weighted add of needs_pmf,
+    remove its deconvolution. If rounding drifts (negative entries or a
+    sum away from 1), it is rebuilt from the remaining cases."""
+
+    __slots__: tuple[str, str, str] = ("_cases", "_method", "_pmf")
+
+    def __init__(
+        self,
+        probs: Sequence[float] = (),
+        needs: Sequence[int] = (),
+        method: PmfMethod = "auto",
+    ) -> None:
+        """Start with the given cases, method is also used for rebuilds."""
+        self._method: PmfMethod = method
+        self._pmf: Any = _pmf(probs, needs, method)
+        self._cases: Counter[tuple[int, float]] = Counter(
+            zip(needs, map(float, probs), strict=True)
+        )
+
+    def __len__(self) -> int:
+        """Number of cases."""
+        return self._cases.total()
+
+    @property
+    def pmf(self) -> list[float]:
+        """Probability of each overall need 0..sum of needs."""
+        return self._pmf if isinstance(self._pmf, list) else self._pmf.tolist()
+
+    def add(self, need: int, prob: float) -> None:
+        """Add one case."""
+        _checkneeds([prob], [need])
+        self._cases[(need, float(prob))] += 1
+        if not need:
+            return
+        top: int = len(self._pmf) - 1
+        if isinstance(self._pmf, list):
+            self._pmf.extend([0.0] * need)
+        else:
+            self._pmf = _numpy().concatenate(  # type: ignore[union-attr]
+                (self._pmf, _numpy().zeros(need))  # type: ignore[union-attr]
+            )
+        _add_case(self._pmf, top, need, prob)
+
+    def remove(self, need: int, prob: float) -> None:
+        """Remove a case added before, ValueError if there is none."""
+        case: tuple[int, float] = (need, float(prob))
+        if not self._cases[case]:
+            raise ValueError(f"no case with need {need} and prob {prob}")
+        self._cases[case] -= 1
+        if not self._cases[case]:
+            del self._cases[case]
+        if not need:
+            return
+        pmf: Any = _remove_case(self._pmf, need, prob)
+        lowest: float = min(pmf) if isinstance(pmf, list) else float(pmf.min())
+        total: float = sum(pmf) if isinstance(pmf, list) else float(pmf.sum())
+        if lowest < -_DRIFT or abs(total - 1) > _DRIFT:
+            thelogger.info("deconvolution drifted by %g, rebuilding", total - 1)
+            needs, probs = (
+                zip(*self._cases.elements(), strict=True) if self._cases else ((), ())
+            )
+            self._pmf = _pmf(probs, needs, self._method)
+        elif isinstance(pmf, list):
+            self._pmf = [max(prob, 0.0) for prob in pmf]
+        else:
+            self._pmf = pmf.clip(0, None)
+
+    def sufficiency(self, avails: float) -> float:
+        """Probability of avails being sufficient."""
+        return _sufficiency(self._pmf, avails)
+
+    def levels(self, avails: Iterable[float] | None = None) -> list[float]:
+        """Sufficiency per stock level as probneeds_levels."""
+        return _levels(_cdf(self._pmf), avails)
+
+    def quantile(self, targets: Iterable[float]) -> list[int]:
+        """Smallest sufficient stock levels as probneeds_quantile."""
+        return _quantiles(self._pmf, list(targets))
+
+
+def _moments(probs: Sequence[float], needs: Sequence[int]) -> tuple[float, ...]:
+    """Mean, variance, third central moment and third absolute moment sum."""
+    numpy: Any = _numpy()
+    if numpy is not None:
+        prob: Any = numpy.asarray(probs, dtype=numpy.float64)
+        need: Any = numpy.asarray(needs, dtype=numpy.float64)
+        pq: Any = prob * (1 - prob)
+        return (
+            float(need @ prob),
+            float(need**2 @ pq),
+            float(need**3 @ (pq * (1 - 2 * prob))),
+            float(need**3 @ (pq * (prob**2 + (1 - prob) ** 2))),
+        )
+    mean: float = 0.0
+    variance: float = 0.0
+    third: float = 0.0
+    absolute: float = 0.0
+    for need, prob in zip(needs, probs, strict=True):
+        mean += need * prob
+        variance += need**2 * prob * (1 - prob)
+        third += need**3 * prob * (1 - prob) * (1 - 2 * prob)
+        absolute += need**3 * prob * (1 - prob) * (prob**2 + (1 - prob) ** 2)
+    return mean, variance, third, absolute
+
+
+@moduleexport
+def probneeds_approx(
+    probs: Sequence[float],
+    needs: Sequence[int],
+    avails: float,
+) -> tuple[float, float]:
+    """Sufficiency by refined normal approximation and its error bound.
+
+    The normal distribution of the overall need is corrected for skewness
+    (first Edgeworth term) and evaluated halfway between the lattice points
+    (multiples of the gcd of needs) around avails. The bound covers this
+    refined value: Berry-Esseen's 0.56 * sum E|X - EX|^3 / sigma^3
+    (Shevtsova) for the plain normal plus the size of the skewness term,
+    the actual error is usually much smaller."""
+    _checkneeds(probs, needs)
+    mean, variance, third, absolute = _moments(probs, needs)
+    if variance <= 0:
+        return (1.0 if mean <= avails else 0.0), 0.0
+    sigma: float = sqrt(variance)
+    lattice: int = gcd(*needs)
+    point: float = (lattice * floor(avails / lattice) + lattice / 2 - mean) / sigma
+    skewterm: float = (
+        third / sigma**3 * (1 - point**2) * exp(-(point**2) / 2) / (6 * sqrt(2 * pi))
+    )
+    result: float = 0.5 * (1 + erf(point / sqrt(2))) + skewterm
+    return min(max(result, 0.0), 1.0), min(
+        1.0, 0.56 * absolute / sigma**3 + abs(skewterm)
+    )
+
+
+@moduleexport
+def probneeds_estimate(
+    probs: Sequence[float],
+    needs: Sequence[int],
+    avails: float,
+    method: EstimateMethod = "auto",
+) -> tuple[float, float]:
+    """Sufficiency with error bound, exact or approximated for huge inputs.
+
+    "auto" approximates (probneeds_approx) if cases times possible overall
+    needs reach _APPROX_MINWORK, where the exact distribution gets too slow
+    and big. Exact results come with a bound of 0."""
+    if method == "auto":
+        method = "approx" if len(needs) * sum(needs) >= _APPROX_MINWORK else "exact"
+    if method == "approx":
+        return probneeds_approx(probs, needs, avails)
+    return _sufficiency(_pmf(probs, needs, "auto"), avails), 0.0
+
+
 @moduleexport
 def probneeds_rec(
     probs: list[float],
@@ -191,17 +648,7 @@ def probneeds_rec(
         avails = sum(p * n for n, p in zip(needs, probs, strict=False))
         thelogger.debug("avails set to expectation value %f", avails)
     thelogger.debug("needs=%s , probs=%s, avails=%i", needs, probs, avails)
-    if lenneeds == 1:
-        return 1 if avails >= needs[0] else 1 - probs[0]
-    return (
-        probs[0]
-        * probneeds_rec(needs=needs[1:], probs=probs[1:], avails=avails - needs[0])
-        + (1 - probs[0])
-        * probneeds_rec(needs=needs[1:], probs=probs[1:], avails=avails)
-        if avails >= needs[0]
-        else (1 - probs[0])
-        * probneeds_rec(needs=needs[1:], probs=probs[1:], avails=avails)
-    )
+    return _sufficiency(_pmf(probs, needs, "auto"), avails)
 
 
 @moduleexport
@@ -220,14 +667,9 @@ def add_dict(
 def probneeds_new(probs: list[float], needs: list[int], avails: int = 0) -> float:
     """Return the probability for an available number beeing
     sufficient for bernoulli cases."""
-    resultdict: dict[int, float] = {0: 1 - probs[0], needs[0]: probs[0]}
-    for need, theprob in zip(needs[1:], probs[1:], strict=False):
-        resultdict = add_dict(
-            {count: prob * (1 - theprob) for count, prob in resultdict.items()},
-            {count + need: prob * theprob for count, prob in resultdict.items()},
-        )
-    thelogger.debug(resultdict)
-    return sum(prob for count, prob in resultdict.items() if count <= avails)
+    pmf: Any = _pmf(probs, needs, "auto")
+    thelogger.debug(pmf)
+    return _sufficiency(pmf, avails)
 
 
 # it differs ([.8,.3,.4,.5,.6]*2,[7,5,1,2,3]*2,17)
@@ -246,20 +688,9 @@ def probneeds(
     if avails == 0:
         avails = sum(needs)
         thelogger.debug("avails set to overall need value %i", avails)
-    stock: dict[int, float] = {avails: 1}
-    for need, prob in zip(needs, probs, strict=False):
-        stocktemp: dict[int, float] = {}
-        for stockcount, stockprob in stock.items():
-            if stockcount - need >= 0:
-                stocktemp[stockcount - need] = (
-                    stocktemp.get(stockcount - need, 0) + stockprob * prob
-                )
-            stocktemp[stockcount] = stocktemp.get(stockcount, 0) + stockprob * (
-                1 - prob
-            )
-        stock = stocktemp
-    thelogger.debug(stock)
-    availprob = sum(stock.values())
+    pmf: Any = _pmf(probs, needs, "auto")
+    thelogger.debug(pmf)
+    availprob: float = _sufficiency(pmf, avails)
     thelogger.info(
         "%i will be sufficient in %f%% of all cases",
         avails,
@@ -1,11 +1,32 @@
 #!/usr/bin/env -S poetry run pytest
 """Test functions for decorators module."""
 
-__lazy_modules__: list[str] = ["time", "valuefragments.decorators"]
+__lazy_modules__: list[str] = [
+    "asyncio",
+    "os",
+    "subprocess",
+    "sys",
+    "concurrent.futures",
+    "pathlib",
+    "pytest",
+    "time",
+    "valuefragments.decorators",
+]
+import asyncio
+import os
+import subprocess
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-from valuefragments.decorators import (
-    memoize,  # pylint: disable=relative-beyond-top-level
+import pytest
+
+from valuefragments.decorators import (  # pylint: disable=relative-beyond-top-level
+    MemoCache,
+    diskmemoize,
+    memoize,
+    stable_call_hash,
 )
 
 
@@ -18,3 +39,169 @@ def test_memoize() -> None:
     start = time.monotonic()
     memsleep(1)
     assert time.monotonic() < start + 1e-4
+
+
+def test_memoize_bounded() -> None:
+    """LRU eviction, kwargs, unhashable arguments and statistics."""
+    calls: list[int] = []
+
+    @memoize(maxsize=2)
+    def double(value: int, offset: int = 0) -> int:
+        calls.append(value)
+        return 2 * value + offset
+
+    assert double(1) == 2
+    assert double(1) == 2
+    assert double(2, offset=1) == 5
+    assert double(3) == 6
+    assert double(2, offset=1) == 5
+    assert double(1) == 2
+    assert calls == [1, 2, 3, 1]
+    assert double.cache_info() == (2, 4, 2, 2)  # type: ignore[attr-defined]
+    double.cache_clear()  # type: ignore[attr-defined]
+    assert double.cache_info() == (0, 0, 2, 0)  # type: ignore[attr-defined]
+    memsum = memoize(sum)
+    assert memsum([1, 2, 3]) == memsum([1, 2, 3]) == 6
+    assert memsum.cache_info().hits == 1  # type: ignore[attr-defined]
+
+
+def test_memoize_ttl_lfu() -> None:
+    """Expired entries are recalculated, LFU keeps the most used."""
+    calls: list[int] = []
+
+    @memoize(maxsize=2, ttl=0.05, policy="LFU")
+    def ident(value: int) -> int:
+        calls.append(value)
+        return value
+
+    ident(1)
+    ident(1)
+    ident(2)
+    ident(3)
+    ident(1)
+    assert calls == [1, 2, 3]
+    time.sleep(0.06)
+    ident(1)
+    assert calls == [1, 2, 3, 1]
+
+
+def test_memocache_lfu_eviction_order() -> None:
+    """LFU evicts the least used key, the older one on ties."""
+    cache: MemoCache[int] = MemoCache(maxsize=3, policy="LFU")
+    for value, key in enumerate("abc"):
+        cache.store(key, value)
+    cache.lookup("a")
+    cache.store("d", 3)  # b and c are used once, b is older
+    assert cache.lookup("b") != 1
+    cache.lookup("c")
+    cache.store("e", 4)  # d is the only key used once
+    assert cache.lookup("d") != 3
+    assert [cache.lookup(key) for key in "ace"] == [0, 2, 4]
+    assert cache.info().currsize == 3
+
+
+def test_memoize_single_flight() -> None:
+    """Concurrent misses on one key call the function once."""
+    calls: list[float] = []
+
+    @memoize
+    def slow(value: float) -> float:
+        calls.append(value)
+        time.sleep(0.1)
+        return value
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(slow, [0.5] * 8)) == [0.5] * 8
+    assert calls == [0.5]
+
+
+@pytest.mark.asyncio
+async def test_memoize_async() -> None:
+    """Concurrent awaits share one execution, the result is reusable."""
+    calls: list[int] = []
+
+    @memoize(ttl=60)
+    async def fetch(value: int) -> int:
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value * 10
+
+    assert await asyncio.gather(*(fetch(4) for _ in range(5))) == [40] * 5
+    assert await fetch(4) == 40
+    assert calls == [4]
+    assert fetch.cache_info().misses == 1  # type: ignore[attr-defined]
+
+
+@pytest.mark.asyncio
+async def test_memoize_async_errors() -> None:
+    """Errors are only cached on request."""
+    calls: list[int] = []
+
+    async def failing(value: int) -> int:
+        calls.append(value)
+        raise ValueError(value)
+
+    uncached = memoize(failing)
+    errcached = memoize(cache_errors=True)(failing)
+    for thefunc in (uncached, uncached, errcached, errcached):
+        with pytest.raises(ValueError):
+            await thefunc(1)
+    assert calls == [1, 1, 1]
+
+
+def test_diskmemoize(tmp_path: Path) -> None:
+    """Results survive a new decoration (like a restart) and expire."""
+    calls: list[int] = []
+
+    def square(value: int) -> int:
+        calls.append(value)
+        return value**2
+
+    dbpath: str = str(tmp_path / "memo.sqlite")
+    assert diskmemoize(dbpath)(square)(3) == 9
+    assert diskmemoize(dbpath)(square)(3) == 9
+    assert calls == [3]
+    assert diskmemoize(dbpath, max_age_seconds=0)(square)(3) == 9
+    assert calls == [3, 3]
+    cached = diskmemoize(dbpath)(square)
+    cached.cache_clear()  # type: ignore[attr-defined]
+    assert cached(3) == 9
+    assert calls == [3, 3, 3]
+
+
+def test_diskmemoize_lazy(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The default database file only appears with the first call."""
+    monkeypatch.chdir(tmp_path)
+    cached = diskmemoize()(abs)
+    assert not (tmp_path / "memoize.sqlite").exists()
+    assert cached(-2) == 2
+    assert (tmp_path / "memoize.sqlite").exists()
+
+
+def test_stable_call_hash() -> None:
+    """Keys ignore dict insertion order and the hash seed."""
+    identity: tuple[str, str, str] = ("mod", "func", "source")
+    assert stable_call_hash(identity, ({"a": 1, "b": 2},), {}) == (
+        stable_call_hash(identity, ({"b": 2, "a": 1},), {})
+    )
+    code: str = (
+        "from valuefragments.decorators import stable_call_hash;"
+        "print(stable_call_hash(('mod', 'func', 'source'),"
+        " ({'alpha', 'beta', 'gamma', 'delta'},),"
+        " {'key': frozenset({'x', 'y', 'z'})}))"
+    )
+    keys: set[str] = {
+        subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            check=True,
+            env={
+                **os.environ,
+                "PYTHONHASHSEED": seed,
+                "PYTHONPATH": os.pathsep.join(sys.path),
+            },
+            text=True,
+        ).stdout
+        for seed in ("1", "2", "3")
+    }
+    assert len(keys) == 1
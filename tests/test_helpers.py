@@ -1,17 +1,40 @@
 #!/usr/bin/env -S poetry run pytest
 """Test functions for helpers module."""
 
+import asyncio
+import hashlib
+import io
 import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import pytest
 
 from valuefragments.helpers import (
+    DirSnapshot,
     HumanReadAble,
+    ParsedResultCache,
+    afilecache,
+    atomic_write,
     basic_auth,
     file_exists_current,
+    filecache,
     getselectedhreflinks,
+    getselectedhreflinks_batch,
     hashfile,
+    hashfiles,
     int2bin,
+    iterselectedhreflinks,
+    load_cores,
     pi_for_cpu_load,
+    pi_for_cpu_load_vectorized,
+    recurse_files_in_folder,
+    scan_files,
     stringtovalidfilename,
+    update_snapshot,
 )
 
 # from .decorators import logdecorate
@@ -39,6 +62,26 @@ def test_pi_for_cpu_load() -> None:
     # assert pi_for_cpu_load(1000000000, 4478) == 3.141731728
 
 
+def test_pi_for_cpu_load_vectorized() -> None:
+    """Blockwise numpy simulation is reproducible and independent of blocks."""
+    pytest.importorskip("numpy")
+    first: float = pi_for_cpu_load_vectorized(10**6, 4478)
+    assert first == pi_for_cpu_load_vectorized(10**6, 4478, blocksize=1000)
+    assert abs(first - 3.1416) < 0.01
+    assert pi_for_cpu_load_vectorized(7, 4478, blocksize=3) in {
+        4 * hits / 7 for hits in range(8)
+    }
+
+
+def test_load_cores() -> None:
+    """Calibrated duty cycle reaches the target load."""
+    with pytest.raises(ValueError):
+        load_cores(1.5, 0.1)
+    core: int = min(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else 0
+    (achieved,) = load_cores(0.5, 1, [core], 0.05)
+    assert 0.35 < achieved < 0.65
+
+
 def test_int2bin() -> None:
     """Check binary representations of numbers and digits."""
     assert int2bin(5, 8) == "00000101"
@@ -71,6 +114,138 @@ def test_hashfile() -> None:
     )
 
 
+def test_hashfiles(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Batch hashing with algorithm choice and sidecar cache."""
+    thefiles: list[str] = []
+    for i in range(5):
+        (tmp_path / f"{i}.bin").write_bytes(bytes(range(i * 50)) * 1000)
+        thefiles.append(str(tmp_path / f"{i}.bin"))
+    cachefile: str = str(tmp_path / "hashes.json")
+    hashes: dict[str, str] = hashfiles(thefiles, "sha256", cachefile=cachefile)
+    assert hashes == {
+        name: hashlib.sha256(Path(name).read_bytes()).hexdigest() for name in thefiles
+    }
+    assert hashfile(thefiles[3], chunklen=7, algorithm="blake2b") == (
+        hashlib.blake2b(Path(thefiles[3]).read_bytes()).hexdigest()
+    )
+
+    def failing(*_args: Any, **_kwargs: Any) -> str:
+        raise AssertionError("unchanged file read again")
+
+    monkeypatch.setattr("valuefragments.helpers.hashfile", failing)
+    assert hashfiles(thefiles, "sha256", cachefile=cachefile) == hashes
+
+
+def test_hashfiles_unreadable(tmp_path: Path) -> None:
+    """A missing file is left out, the others are hashed and cached."""
+    (tmp_path / "there.bin").write_bytes(b"there")
+    thefiles: list[str] = [str(tmp_path / "gone.bin"), str(tmp_path / "there.bin")]
+    cachefile: str = str(tmp_path / "hashes.json")
+    assert hashfiles(thefiles, cachefile=cachefile) == {
+        thefiles[1]: hashlib.md5(b"there").hexdigest()
+    }
+    assert thefiles[1] in Path(cachefile).read_text(encoding="utf-8")
+
+
+def test_scan_files(tmp_path: Path) -> None:
+    """Filtering, pruning, stat data and parallel mode."""
+    for sub in ("a", "a/b", "skip", "c"):
+        (tmp_path / sub).mkdir()
+    for name in ("x.csv", "a/y.csv", "a/b/z.txt", "skip/w.csv", "c/v.csv.bak"):
+        (tmp_path / name).write_text(name)
+    assert sorted(entry.path for entry in scan_files(str(tmp_path))) == sorted(
+        recurse_files_in_folder(str(tmp_path))
+    )
+    found = sorted(
+        scan_files(str(tmp_path), include=["*.csv", "*.txt"], prune=["skip"])
+    )
+    assert [os.path.relpath(entry.path, tmp_path) for entry in found] == [
+        os.path.join("a", "b", "z.txt"),
+        os.path.join("a", "y.csv"),
+        "x.csv",
+    ]
+    assert found[2].size == 5
+    assert found[2].mtime_ns == os.stat(found[2].path).st_mtime_ns
+    assert sorted(scan_files(str(tmp_path), exclude=["*.txt"], parallel=4)) == sorted(
+        scan_files(str(tmp_path), exclude=["*.txt"])
+    )
+
+
+@pytest.mark.skipif(os.name == "nt", reason="symlinks need privileges")
+def test_scan_files_symlinks(tmp_path: Path) -> None:
+    """Symlinked dirs are skipped like os.walk does or entered once.
+
+    Symlinked files report the data of their target."""
+    (tmp_path / "real").mkdir()
+    (tmp_path / "real" / "x.csv").write_text("x")
+    (tmp_path / "real" / "loop").symlink_to(tmp_path, target_is_directory=True)
+    (tmp_path / "link").symlink_to(tmp_path / "real", target_is_directory=True)
+    (tmp_path / "y.csv").symlink_to(tmp_path / "real" / "x.csv")
+    assert sorted(entry.path for entry in scan_files(str(tmp_path))) == sorted(
+        recurse_files_in_folder(str(tmp_path))
+    )
+    found = {
+        os.path.relpath(entry.path, tmp_path): entry
+        for entry in scan_files(str(tmp_path), follow_symlinks=True)
+    }
+    assert len(found) == 2
+    assert "y.csv" in found
+    assert found.keys() - {"y.csv"} <= {
+        os.path.join("link", "x.csv"),
+        os.path.join("real", "x.csv"),
+    }
+    target: os.stat_result = os.stat(tmp_path / "real" / "x.csv")
+    assert found["y.csv"][1:] == (target.st_size, target.st_mtime_ns, target.st_ino)
+    assert len(list(scan_files(str(tmp_path), follow_symlinks=True, parallel=3))) == 2
+
+
+def test_update_snapshot(tmp_path: Path) -> None:
+    """Changes are detected, touched but unchanged files are not."""
+    (tmp_path / "tree").mkdir()
+    for name in ("keep", "touch", "change", "remove"):
+        (tmp_path / "tree" / name).write_text(name)
+    tree: str = str(tmp_path / "tree")
+    snapshotfile: str = str(tmp_path / "snap.json.gz")
+    assert update_snapshot(tree, snapshotfile, "sha256").added == [
+        "change",
+        "keep",
+        "remove",
+        "touch",
+    ]
+    os.utime(tmp_path / "tree" / "touch", ns=(1, 1))
+    (tmp_path / "tree" / "change").write_text("changed")
+    (tmp_path / "tree" / "remove").unlink()
+    (tmp_path / "tree" / "add").write_text("add")
+    assert update_snapshot(tree, snapshotfile, "sha256") == (
+        ["add"],
+        ["remove"],
+        ["change"],
+    )
+    assert update_snapshot(tree, snapshotfile, "sha256") == ([], [], [])
+
+
+def test_snapshot_unhashable(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Unreadable and vanished files and dir symlinks do not abort a snapshot."""
+    for name in ("keep", "locked", "vanish"):
+        (tmp_path / name).write_text(name)
+    if os.name != "nt":
+        (tmp_path / "loop").symlink_to(tmp_path, target_is_directory=True)
+    realhashfile = hashfile
+
+    def flaky(filename: str, **kwargs: Any) -> str:
+        if filename.endswith("locked"):
+            raise PermissionError(filename)
+        if filename.endswith("vanish"):
+            os.unlink(filename)
+        return realhashfile(filename, **kwargs)
+
+    monkeypatch.setattr("valuefragments.helpers.hashfile", flaky)
+    snapshot: DirSnapshot = DirSnapshot.take(str(tmp_path), "sha256")
+    assert sorted(snapshot.entries) == ["keep", "locked"]
+    assert snapshot.entries["keep"][2] == hashlib.sha256(b"keep").hexdigest()
+    assert snapshot.entries["locked"][2] is None
+
+
 def test_humanreadable() -> None:
     """Check if Calculation and units work."""
     assert format(HumanReadAble(2**10)) == "1.0 KiB"
@@ -84,3 +259,240 @@ def test_getselectedhreflinks() -> None:
     assert "https://status.python.org/" in getselectedhreflinks(
         "https://python.org", "status"
     )
+
+
+def test_getselectedhreflinks_batch() -> None:
+    """Concurrent fetching on a pooled session within the per-host limit."""
+    active: list[int] = [0, 0]  # current, maximum
+    activelock: threading.Lock = threading.Lock()
+
+    class Handler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            with activelock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.05)
+            body: bytes = (
+                f'<a href="/result{self.path}.pdf">r</a><a href="/other">o</a>'
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with activelock:
+                active[0] -= 1
+
+        def log_request(self, code: int | str = "-", size: int | str = "-") -> None:
+            pass
+
+    with ThreadingHTTPServer(("127.0.0.1", 0), Handler) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        thebase: str = f"http://127.0.0.1:{server.server_address[1]}"
+        theurls: list[str] = [f"{thebase}/page{number}" for number in range(8)]
+        links: dict[str, list[str]] = getselectedhreflinks_batch(
+            theurls + [theurls[0], "http://127.0.0.1:1/refused"],
+            "result",
+            maxperhost=2,
+        )
+        server.shutdown()
+    assert list(links) == theurls + ["http://127.0.0.1:1/refused"]
+    assert links[theurls[3]] == ["/result/page3.pdf"]
+    assert links["http://127.0.0.1:1/refused"] == []
+    assert active[1] == 2
+
+
+def test_iterselectedhreflinks(tmp_path: Path) -> None:
+    """Streaming extraction matches the tree based one, stops early."""
+    (tmp_path / "page.html").write_text(
+        "<html><body><ul>"
+        + "".join(
+            f'<li><a href="/{"hit" if number % 3 else "miss"}{number}">x</a></li>'
+            for number in range(5000)
+        )
+        + "</ul></body></html>"
+    )
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, directory=str(tmp_path), **kwargs)
+
+        def log_request(self, code: int | str = "-", size: int | str = "-") -> None:
+            pass
+
+    with ThreadingHTTPServer(("127.0.0.1", 0), Handler) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        theurl: str = f"http://127.0.0.1:{server.server_address[1]}/page.html"
+        expected: list[str] = getselectedhreflinks(theurl, "hit")
+        assert len(expected) == 3333
+        assert list(iterselectedhreflinks(theurl, "hit", chunklen=1000)) == expected
+        assert getselectedhreflinks(theurl, "hit", maxlinks=3) == expected[:3]
+        assert not getselectedhreflinks(theurl, "hit", maxlinks=0)
+        server.shutdown()
+
+
+def readbytes(filepathname: str) -> bytes:
+    """Procmeth for filecache tests."""
+    return Path(filepathname).read_bytes()
+
+
+def test_filecache(tmp_path: Path) -> None:
+    """Refresh only when outdated, a failing update keeps the old copy."""
+    thepath: str = str(tmp_path / "cached.txt")
+
+    def failing() -> io.BytesIO:
+        raise OSError("no source")
+
+    assert filecache(thepath, lambda: io.BytesIO(b"first"), readbytes) == b"first"
+    assert filecache(thepath, failing, readbytes) == b"first"
+    with pytest.raises(OSError):
+        filecache(thepath, failing, readbytes, max_age_seconds=0)
+    assert Path(thepath).read_bytes() == b"first"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_atomic_write_mode(tmp_path: Path) -> None:
+    """New files get the umask mode, replaced files keep their mode."""
+    umask: int = os.umask(0o022)
+    os.umask(umask)
+    thepath: Path = tmp_path / "written.txt"
+    atomic_write(str(thepath), [b"new"])
+    assert thepath.stat().st_mode & 0o777 == 0o666 & ~umask
+    thepath.chmod(0o640)
+    atomic_write(str(thepath), [b"replaced"])
+    assert thepath.stat().st_mode & 0o777 == 0o640
+    assert thepath.read_bytes() == b"replaced"
+
+
+def test_filecache_resultcache(tmp_path: Path) -> None:
+    """Unchanged files are not processed again, changed ones are."""
+    thepath: str = str(tmp_path / "cached.txt")
+    parsed: list[str] = []
+
+    def parse(filepathname: str) -> bytes:
+        parsed.append(filepathname)
+        return readbytes(filepathname)
+
+    resultcache = ParsedResultCache(maxentries=1)
+    for _ in range(3):
+        assert (
+            filecache(thepath, lambda: io.BytesIO(b"a"), parse, resultcache=resultcache)
+            == b"a"
+        )
+    assert len(parsed) == 1
+    assert (
+        filecache(thepath, lambda: io.BytesIO(b"bb"), parse, 0, resultcache=resultcache)
+        == b"bb"
+    )
+    assert len(parsed) == 2
+    assert resultcache.currbytes == 2
+    (tmp_path / "other.txt").write_bytes(b"ccc")
+    assert resultcache.process(str(tmp_path / "other.txt"), readbytes) == b"ccc"
+    assert resultcache.currbytes == 3
+    resultcache.process(thepath, parse)
+    assert len(parsed) == 3
+
+
+@pytest.mark.asyncio
+async def test_afilecache_resultcache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """An async hit on a current unchanged file needs one stat call."""
+    thepath: str = str(tmp_path / "cached.txt")
+    resultcache = ParsedResultCache()
+    assert (
+        await afilecache(
+            thepath, lambda: io.BytesIO(b"a"), readbytes, resultcache=resultcache
+        )
+        == b"a"
+    )
+    stats: list[str] = []
+    realstat = os.stat
+
+    def countingstat(path: Any, *args: Any, **kwargs: Any) -> os.stat_result:
+        stats.append(os.fspath(path))
+        return realstat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", countingstat)
+    assert (
+        await afilecache(thepath, failingsource, readbytes, resultcache=resultcache)
+        == b"a"
+    )
+    assert stats.count(thepath) == 1
+
+
+def failingsource() -> io.BytesIO:
+    """Genupdmeth which must not be called."""
+    raise AssertionError("current file refreshed")
+
+
+def slowsource(content: bytes) -> io.BytesIO:
+    """Genupdmeth with some latency."""
+    time.sleep(0.2)
+    return io.BytesIO(content)
+
+
+def test_filecache_background(tmp_path: Path) -> None:
+    """Stale content is returned at once and refreshed in background."""
+    thepath: str = str(tmp_path / "cached.txt")
+    Path(thepath).write_bytes(b"old")
+    start: float = time.monotonic()
+    assert (
+        filecache(thepath, lambda: slowsource(b"new"), readbytes, 0, background=True)
+        == b"old"
+    )
+    assert time.monotonic() - start < 0.1
+    time.sleep(0.4)
+    assert readbytes(thepath) == b"new"
+    os.utime(thepath, (0, 0))
+    assert (
+        filecache(
+            thepath,
+            lambda: slowsource(b"newer"),
+            readbytes,
+            0,
+            background=True,
+            max_stale_seconds=60,
+        )
+        == b"newer"
+    )
+
+
+@pytest.mark.asyncio
+async def test_afilecache(tmp_path: Path) -> None:
+    """Async variant with refresh as asyncio task."""
+    thepath: str = str(tmp_path / "cached.txt")
+    assert await afilecache(thepath, lambda: io.BytesIO(b"old"), readbytes) == b"old"
+    assert (
+        await afilecache(
+            thepath, lambda: slowsource(b"new"), readbytes, 0, background=True
+        )
+        == b"old"
+    )
+    await asyncio.sleep(0.4)
+    assert await afilecache(thepath, lambda: io.BytesIO(b"x"), readbytes) == b"new"
+
+
+def test_filecache_http(tmp_path: Path) -> None:
+    """Unchanged upstream data is revalidated by a 304."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "data.txt").write_bytes(b"upstream")
+    statuses: list[int] = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, directory=str(tmp_path / "src"), **kwargs)
+
+        def log_request(self, code: int | str = "-", size: int | str = "-") -> None:
+            statuses.append(int(code))
+
+    with ThreadingHTTPServer(("127.0.0.1", 0), Handler) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        theurl: str = f"http://127.0.0.1:{server.server_address[1]}/data.txt"
+        thepath: str = str(tmp_path / "cached.txt")
+        assert filecache(thepath, theurl, readbytes) == b"upstream"
+        assert filecache(thepath, theurl, readbytes, 0) == b"upstream"
+        server.shutdown()
+    assert statuses == [200, 304]
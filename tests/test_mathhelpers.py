@@ -1,12 +1,26 @@
 #!/usr/bin/env -S poetry run pytest
 """Test functions for mathhelpers module."""
 
+import random
+from typing import Any
+
+import pytest
+
+from valuefragments import mathhelpers
 from valuefragments.mathhelpers import (
+    NeedsDistribution,
     easybisect,
     loanrate,
+    needs_pmf,
     polyroot,
     probneeds,
+    probneeds_approx,
+    probneeds_estimate,
+    probneeds_levels,
+    probneeds_new,
+    probneeds_quantile,
     probneeds_rec,
+    probneeds_scenarios,
 )
 
 
@@ -46,6 +60,33 @@ def test_probneeds_rec() -> None:
     assert probneeds_rec(needs=[], probs=[], avails=4) == 1
     assert probneeds_rec(needs=[2, 3], probs=[0.4, 0.6]) == 0.4
     assert probneeds_rec(needs=[2, 3], probs=[0.4, 0.6], avails=3) == 0.76
+    # the former recursion took exhausted avails (0) for the default and
+    # continued with the expectation of the remaining cases, giving 0.595
+    assert probneeds_rec(
+        needs=[2, 1, 1], probs=[0.5, 0.9, 0.9], avails=2
+    ) == pytest.approx(0.505)
+
+
+def test_needs_pmf(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Dense, list and FFT engines agree, all three probneeds as well."""
+    assert needs_pmf([0.4, 0.6], [2, 3]) == pytest.approx(
+        [0.24, 0, 0.16, 0.36, 0, 0.24]
+    )
+    rng: random.Random = random.Random(4478)
+    needs: list[int] = [rng.randint(0, 9) for _ in range(300)]
+    probs: list[float] = [rng.random() for _ in range(300)]
+    direct: list[float] = needs_pmf(probs, needs, "direct")
+    assert len(direct) == sum(needs) + 1
+    assert sum(direct) == pytest.approx(1)
+    assert needs_pmf(probs, needs, "fft") == pytest.approx(direct, abs=1e-12)
+    assert probneeds_rec(probs, needs, 1200) == pytest.approx(sum(direct[:1201]))
+    assert probneeds_new(probs, needs, 1200) == probneeds(probs, needs, 1200)
+    with pytest.raises(ValueError):
+        needs_pmf([0.5], [-1])
+    monkeypatch.setattr(mathhelpers, "_numpy", lambda: None)
+    assert needs_pmf(probs, needs, "direct") == pytest.approx(direct, abs=1e-12)
+    with pytest.raises(ImportError):
+        needs_pmf(probs, needs, "fft")
 
 
 def test_loanrate() -> None:
@@ -55,3 +96,115 @@ def test_loanrate() -> None:
     assert abs(loanrate(250000, 0.035, 16) - 1702.37) < 1e-2
     assert abs(loanrate(250000, 0.035, 17) - 1627.75) < 1e-2
     assert abs(loanrate(250000, 0.04, 15) - 1849.22) < 1e-2
+
+
+def test_probneeds_levels(monkeypatch: pytest.MonkeyPatch) -> None:
+    """All stock levels and scenarios from one distribution each."""
+    assert probneeds_levels([0.4, 0.6], [2, 3]) == pytest.approx(
+        [0.24, 0.24, 0.4, 0.76, 0.76, 1]
+    )
+    assert probneeds_levels([0.4, 0.6], [2, 3], [-1, 2.5, 9]) == pytest.approx(
+        [0, 0.4, 1]
+    )
+    rows: list[list[float]] = [[0.4, 0.6], [0.1, 0.9], [1, 0]]
+    expected: list[float] = [
+        probneeds(row, [2, 3], level) for row in rows for level in (1, 2, 3, 5)
+    ]
+    assert sum(probneeds_scenarios(rows, [2, 3], [1, 2, 3, 5]), []) == pytest.approx(
+        expected
+    )
+    monkeypatch.setattr(mathhelpers, "_numpy", lambda: None)
+    assert sum(probneeds_scenarios(rows, [2, 3], [1, 2, 3, 5]), []) == pytest.approx(
+        expected
+    )
+    assert len(probneeds_scenarios(rows, [2, 3])[0]) == 6
+
+
+def test_probneeds_quantile(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Smallest sufficient stock levels for service level targets."""
+    assert probneeds_quantile([0.4, 0.6], [2, 3], 0.5) == 3
+    assert probneeds_quantile([0.4, 0.6], [2, 3], [0.99, 0.24, 0.3, 1]) == [5, 0, 2, 5]
+    rng: random.Random = random.Random(4478)
+    needs: list[int] = [rng.randint(0, 9) for _ in range(50)]
+    probs: list[float] = [rng.random() for _ in range(50)]
+    levels: list[int] = probneeds_quantile(probs, needs, [0.95, 0.99])
+    for level, target in zip(levels, [0.95, 0.99], strict=True):
+        assert (
+            probneeds(probs, needs, level)
+            >= target
+            > probneeds(probs, needs, level - 1)
+        )
+    monkeypatch.setattr(mathhelpers, "_numpy", lambda: None)
+    assert probneeds_quantile(probs, needs, [0.95, 0.99]) == levels
+    with pytest.raises(ValueError):
+        probneeds_quantile(probs, needs, 1.5)
+
+
+def test_needsdistribution(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Adding and removing cases matches a fresh distribution."""
+    rng: random.Random = random.Random(4478)
+    needs: list[int] = [rng.randint(0, 9) for _ in range(40)]
+    probs: list[float] = [rng.random() for _ in range(40)]
+    for numpy in (True, False):
+        if not numpy:
+            monkeypatch.setattr(mathhelpers, "_numpy", lambda: None)
+        distribution: NeedsDistribution = NeedsDistribution(probs[:30], needs[:30])
+        for need, prob in zip(needs[30:], probs[30:], strict=True):
+            distribution.add(need, prob)
+        distribution.add(4, 0.97)
+        distribution.remove(4, 0.97)
+        for need, prob in zip(needs[:10], probs[:10], strict=True):
+            distribution.remove(need, prob)
+        assert len(distribution) == 30
+        assert distribution.pmf == pytest.approx(
+            needs_pmf(probs[10:], needs[10:]), abs=1e-12
+        )
+        assert distribution.sufficiency(100) == pytest.approx(
+            probneeds(probs[10:], needs[10:], 100)
+        )
+        assert distribution.levels([100]) == pytest.approx(
+            [distribution.sufficiency(100)]
+        )
+        assert distribution.quantile([0.9]) == [
+            probneeds_quantile(probs[10:], needs[10:], 0.9)
+        ]
+        with pytest.raises(ValueError):
+            distribution.remove(4, 0.97)
+    monkeypatch.setattr(mathhelpers, "_DRIFT", -1.0)
+    methods: list[str] = []
+    realpmf = mathhelpers._pmf
+
+    def recordingpmf(probs: list[float], needs: list[int], method: str) -> Any:
+        methods.append(method)
+        return realpmf(probs, needs, method)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(mathhelpers, "_pmf", recordingpmf)
+    distribution = NeedsDistribution([0.5], [1], "direct")
+    distribution.remove(1, 0.5)
+    assert methods == ["direct", "direct"]
+
+
+def test_probneeds_estimate(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Refined normal approximation within its bound, exact for small inputs."""
+    rng: random.Random = random.Random(4478)
+    needs: list[int] = [rng.randint(1, 20) for _ in range(2000)]
+    probs: list[float] = [rng.random() for _ in range(2000)]
+    for target in (0.05, 0.5, 0.95):
+        level: int = probneeds_quantile(probs, needs, target)
+        exact, nobound = probneeds_estimate(probs, needs, level)
+        assert nobound == 0
+        approx, bound = probneeds_approx(probs, needs, level)
+        assert abs(approx - exact) < min(bound, 1e-4)
+        assert probneeds_estimate(probs, needs, level, "approx") == (approx, bound)
+    assert probneeds_approx([1, 0], [3, 5], 3) == (1, 0)
+    assert probneeds_approx([1, 0], [3, 5], 2) == (0, 0)
+    # avails between the multiples of gcd 10 the overall need can take
+    exact = probneeds_estimate([0.3] * 400, [10] * 400, 1209, "exact")[0]
+    approx, bound = probneeds_approx([0.3] * 400, [10] * 400, 1209)
+    assert abs(approx - exact) < 1e-4 < bound
+    monkeypatch.setattr(mathhelpers, "_APPROX_MINWORK", 1)
+    assert probneeds_estimate(probs, needs, 10000)[1] > 0
+    monkeypatch.setattr(mathhelpers, "_numpy", lambda: None)
+    assert probneeds_approx(probs, needs, 10000) == pytest.approx(
+        probneeds_estimate(probs, needs, 10000)
+    )
@@ -1,23 +1,45 @@
 """Async test thread,tpe,ppe.
-Attention: Only with PPE (ProcessPoolExecutor) randoms will be reproducible,
-as within threads (tpe and thread) it could not be guaranteed.
+pi_for_cpu_load uses its own random generator per call, so the seeded
+results are reproducible in every mode.
 """
 
 __lazy_modules__: list[str] = [
     "asyncio",
     "collections.abc",
+    "contextlib",
+    "concurrent.futures",
     "functools",
     "math",
+    "os",
     "pytest",
+    "threading",
+    "time",
     "valuefragments.helpers",
 ]
-from collections.abc import Callable
+import gc
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import aclosing
 from functools import partial
 from math import pi
 
 import pytest
 
-from valuefragments.helpers import pi_for_cpu_load, run_grouped
+from valuefragments.helpers import (
+    combine_pi_hits,
+    get_executor,
+    learned_costs,
+    pi_for_cpu_load,
+    pi_task_calls,
+    recommended_how,
+    run_grouped,
+    run_grouped_as_completed,
+    shutdown_executors,
+    warmup_executor,
+)
 
 COUNT: int = 100
 
@@ -29,10 +51,8 @@ tasklist: list[Callable[[], float]] = [
 
 @pytest.mark.asyncio
 async def test_run_grouped_thread() -> None:
-    """Fake main routine for async processing."""
-    assert (
-        abs(sum(await run_grouped(tasklist, "thread"), -COUNT * pi)) <= pi / 100 * COUNT
-    )
+    """Fake main routine for async processing, reproducible in threads."""
+    assert await run_grouped(tasklist, "thread") == [3.1276] * COUNT
 
 
 @pytest.mark.asyncio
@@ -43,5 +63,281 @@ async def test_run_grouped_ppe() -> None:
 
 @pytest.mark.asyncio
 async def test_run_grouped_tpe() -> None:
-    """Fake main routine for async processing."""
-    assert abs(sum(await run_grouped(tasklist, "tpe"), -COUNT * pi)) <= pi / 100 * COUNT
+    """Fake main routine for async processing, reproducible in threads."""
+    assert await run_grouped(tasklist, "tpe") == [3.1276] * COUNT
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_split_pi() -> None:
+    """Independent streams per part combine to the same pi in every mode."""
+    calls: list[Callable[[], int]] = pi_task_calls(10**5, 7, 4478)
+    assert len(calls) == 7
+    expected: float = combine_pi_hits([call() for call in calls], 10**5)
+    assert abs(expected - pi) < 0.05
+    for how in ("thread", "tpe", "ppe"):
+        assert combine_pi_hits(await run_grouped(calls, how), 10**5) == expected
+    assert (
+        combine_pi_hits(
+            await run_grouped(pi_task_calls(10**5, 7, 4478), "thread"), 10**5
+        )
+        == expected
+    )
+    assert pi_task_calls(10, 3, 1)[0].args != pi_task_calls(10, 3, 2)[0].args
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_max_concurrency() -> None:
+    """Input is only read as fast as calls complete."""
+    outstanding: list[int] = []
+    finished: list[int] = []
+    active: list[int] = [0, 0]  # current, maximum
+    lock = threading.Lock()
+
+    def work(index: int) -> int:
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+            finished.append(index)
+        return index
+
+    def gencalls() -> Iterator[Callable[[], int]]:
+        for index in range(20):
+            outstanding.append(index - len(finished))
+            yield partial(work, index)
+
+    assert await run_grouped(gencalls(), "tpe", max_concurrency=3) == list(range(20))
+    assert active[1] <= 3
+    assert max(outstanding) <= 3
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_as_completed() -> None:
+    """Streaming results with index from an async iterable."""
+
+    async def acalls() -> AsyncIterator[Callable[[], float]]:
+        for numiter in (30000, 10, 1000):
+            yield partial(pi_for_cpu_load, numiter, 4478)
+
+    received: list[tuple[int, float]] = [
+        item async for item in run_grouped_as_completed(acalls(), max_concurrency=2)
+    ]
+    assert sorted(index for index, _ in received) == [0, 1, 2]
+    assert received[0][0] != 0
+    assert dict(received)[1] == 3.2
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_shared_executor() -> None:
+    """Process pools are created once, warmed up and reused."""
+    pids: set[int] = warmup_executor("ppe", 2)
+    assert len(pids) == 2
+    assert get_executor("ppe", 2) is get_executor("ppe", 2)
+    calls: list[Callable[[], int]] = [os.getpid] * 8
+    assert set(await run_grouped(calls, "ppe", executor=get_executor("ppe", 2))) <= pids
+    sharedexecutor = get_executor("ppe")
+    assert os.getpid() not in await run_grouped(calls, "ppe")
+    assert get_executor("ppe") is sharedexecutor
+    shutdown_executors()
+    assert get_executor("ppe") is not sharedexecutor
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_chunksize() -> None:
+    """Chunked process pool keeps input order."""
+    calls: list[Callable[[], float]] = [
+        partial(pi_for_cpu_load, numiter, 4478) for numiter in (10, 100, 1000) * 11
+    ]
+    expected: list[float] = [3.2, 3.32, 3.176] * 11
+    assert await run_grouped(calls, "ppe", chunksize=7) == expected
+    assert await run_grouped(calls, "ppe", chunksize="auto") == expected
+    powers: list[Callable[[], int]] = [partial(pow, 2, exp) for exp in range(50)]
+    assert await run_grouped(iter(powers), "thread", chunksize="auto") == [
+        2**exp for exp in range(50)
+    ]
+
+
+def flaky(failures: list[int]) -> str:
+    """Fail as long as failures has elements."""
+    if failures:
+        failures.pop()
+        raise ValueError("flaky")
+    return "ok"
+
+
+def maybe_hang(seconds: float) -> float:
+    """Sleep for given seconds, to provoke timeouts."""
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_errors() -> None:
+    """Retries, collected exceptions and timeouts."""
+    assert await run_grouped([partial(flaky, [1, 2])], "tpe", retries=2) == ["ok"]
+    results = await run_grouped(
+        [partial(flaky, [1]), partial(flaky, [])], "thread", return_exceptions=True
+    )
+    assert isinstance(results[0], ValueError)
+    assert results[1] == "ok"
+    with pytest.raises(ValueError):
+        await run_grouped([partial(flaky, [1])], "thread")
+    start: float = time.monotonic()
+    results = await run_grouped(
+        [partial(maybe_hang, 10), partial(maybe_hang, 0.01)],
+        "ppe",
+        executor=get_executor("ppe", 2, "spawn"),
+        timeout=1,
+        return_exceptions=True,
+    )
+    assert time.monotonic() - start < 5
+    assert isinstance(results[0], TimeoutError)
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_timeout_oversubscribed() -> None:
+    """Queued calls do not time out, only running ones count."""
+    results = await run_grouped(
+        [partial(maybe_hang, 0.3)] * 12,
+        "ppe",
+        executor=get_executor("ppe", 2),
+        timeout=1,
+        return_exceptions=True,
+    )
+    assert results == [0.3] * 12
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_timeout_own_executor() -> None:
+    """A pool of the caller is not terminated and timeouts are not retried."""
+    with ProcessPoolExecutor(2) as executor:
+        results = await run_grouped(
+            [partial(maybe_hang, 2), partial(maybe_hang, 0.01)],
+            "ppe",
+            executor=executor,
+            timeout=0.5,
+            retries=1,
+            return_exceptions=True,
+        )
+        assert isinstance(results[0], TimeoutError)
+        assert results[1] == 0.01
+        assert executor.submit(maybe_hang, 0.01).result() == 0.01
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_ipe_auto() -> None:
+    """Sub-interpreters or their fallback, automatic choice."""
+    assert recommended_how() in ("thread", "ipe", "ppe")
+    with pytest.raises(ValueError, match="'bogus'"):
+        await run_grouped(tasklist[:1], "bogus")  # type: ignore[arg-type]
+    assert await run_grouped(tasklist[:10], "ipe") == [3.1276] * 10
+    assert await run_grouped(tasklist[:10], "auto") == [3.1276] * 10
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_sharedmemory() -> None:
+    """Large buffer results arrive in shared memory, small ones pickled."""
+    numpy = pytest.importorskip("numpy")
+    results = await run_grouped(
+        [partial(bytes, 10**6), partial(bytes, 10), partial(numpy.arange, 10**5)],
+        "ppe",
+        sharedmemory=2**16,
+    )
+    assert results[1] == bytes(10)
+    with results[0] as bigbytes:
+        assert bytes(bigbytes.value) == bytes(10**6)
+    with results[2] as bigarray:
+        assert (bigarray.value == numpy.arange(10**5)).all()
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_sharedmemory_dtypes() -> None:
+    """Arrays whose dtype can not be shared come back pickled and intact."""
+    numpy = pytest.importorskip("numpy")
+    dates = numpy.arange("2000-01-01", "2010-01-01", dtype="datetime64[D]")
+    records = numpy.zeros(1000, dtype=[("x", "i4"), ("y", "f8")])
+    records["y"] = 0.5
+    results = await run_grouped(
+        [partial(numpy.copy, dates), partial(numpy.copy, records)],
+        "ppe",
+        sharedmemory=1024,
+    )
+    assert (results[0] == dates).all()
+    assert results[1].dtype.names == ("x", "y")
+    assert (results[1] == records).all()
+
+
+def boom() -> bytes:
+    """Fail a call."""
+    raise ValueError("boom")
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="segments in /dev/shm")
+@pytest.mark.asyncio
+async def test_run_grouped_sharedmemory_no_leak() -> None:
+    """Segments of failed, abandoned and forgotten results are unlinked."""
+    before: set[str] = set(os.listdir("/dev/shm"))
+    with pytest.raises(ValueError):
+        await run_grouped(
+            [partial(bytes, 10**6), boom, partial(bytes, 10**6)],
+            "ppe",
+            sharedmemory=1024,
+            chunksize=3,
+        )
+    async with aclosing(
+        run_grouped_as_completed([partial(bytes, 10**6)] * 4, "ppe", sharedmemory=1024)
+    ) as results:
+        first = await anext(results)
+    del first
+    forgotten = await run_grouped([partial(bytes, 10**6)], "ppe", sharedmemory=1024)
+    del forgotten
+    gc.collect()
+    for _ in range(50):  # abandoned chunks are cleaned up when they finish
+        if not set(os.listdir("/dev/shm")) - before:
+            break
+        time.sleep(0.1)
+    assert not set(os.listdir("/dev/shm")) - before
+
+
+def traced(name: str, seconds: float, started: list[str]) -> str:
+    """Note start of name, then sleep for given seconds."""
+    started.append(name)
+    time.sleep(seconds)
+    return name
+
+
+@pytest.mark.asyncio
+async def test_run_grouped_costs() -> None:
+    """Longest first by given, computed and learned costs, input order kept."""
+    started: list[str] = []
+    calls: list[Callable[[], str]] = [
+        partial(traced, name, seconds, started)
+        for name, seconds in (("short", 0.0), ("long", 0.02), ("mid", 0.01))
+    ]
+    with ThreadPoolExecutor(1) as single:
+        assert await run_grouped(
+            calls, "tpe", executor=single, costs=[0.0, 0.02, 0.01]
+        ) == ["short", "long", "mid"]
+        assert started == ["long", "mid", "short"]
+        started.clear()
+        assert await run_grouped(
+            calls, "tpe", executor=single, costs=lambda funcall: -funcall.args[1]
+        ) == ["short", "long", "mid"]
+        assert started == ["short", "mid", "long"]
+        with pytest.raises(ValueError):
+            await run_grouped(calls, "tpe", executor=single, costs=[1.0])
+    assert learned_costs()[f"{traced.__module__}.traced"] > 0
+    # a costs callback may look at learned costs itself
+    assert await run_grouped(
+        calls, "thread", costs=lambda _: learned_costs().get("unknown")
+    ) == ["short", "long", "mid"]
+    assert await run_grouped(calls, "thread", costs="learned", chunksize="auto") == [
+        "short",
+        "long",
+        "mid",
+    ]